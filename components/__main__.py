@@ -0,0 +1,50 @@
+"""
+Command line entry point of the simulation.
+
+    python -m components run scenario.toml [-o metrics.json] [--viewer]
+
+See components.scenario for the scenario file format.
+"""
+import argparse
+import json
+import os
+import sys
+# Keep stdout machine-readable: pygame prints a banner on import unless this is set.
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+from components.graph import Graph
+from components.scenario import load_scenario, run_scenario
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m components', description='Congestion Control Simulation.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run a scenario file to its horizon and write its metrics as JSON')
+    run.add_argument('scenario', help='scenario TOML file')
+    run.add_argument('-o', '--output', default=None, help='write the metrics to this file instead of stdout')
+    run.add_argument('--engine', default=None, choices=list(Graph.engines), help="override the scenario's engine")
+    run.add_argument('--seed', type=int, default=None, help="override the scenario's seed and its demand seed")
+    run.add_argument('--viewer', action='store_true',
+                     help='draw the run in a pygame window (from the repository root, for images/ and fonts/)')
+    run.add_argument('--fps', type=int, default=30, help='viewer frame rate, 0 to draw as fast as possible')
+    args = parser.parse_args(argv)
+    try:
+        scenario = load_scenario(args.scenario)
+        if args.engine is not None:
+            scenario['engine'] = args.engine
+        if args.seed is not None:
+            scenario['seed'] = args.seed
+            scenario['demand']['seed'] = args.seed
+        result = run_scenario(scenario, viewer=args.viewer, fps=args.fps)
+    except (OSError, ValueError) as error:
+        parser.exit(2, f'{parser.prog} run: error: {error}\n')
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(result, file, indent=2)
+            file.write('\n')
+    else:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,448 @@
+import numpy as np
+from components.edge import Edge
+from components.intersection import Intersection
+from components.methods.methods import Location, center_blit, rotate_image
+
+__all__ = ['ArrayEngine']
+
+
+class ArrayEngine:
+    """
+    Structure-of-arrays vehicle engine.
+    Vehicle state is kept in NumPy arrays indexed by slot, so edge traversal,
+    arrival detection and wait time updates are done for all vehicles at once per tick.
+    Finished vehicles are moved to graph.trips and their slots reused, so the arrays
+    only grow with the number of vehicles in flight.
+    Produces the same statistics as the per-object Vehicle loop for the same random state.
+    """
+    # Edge kinds, i.e. the movement a vehicle makes when it enters the edge.
+    LT, GS, RT, LINK = Edge.LT, Edge.GS, Edge.RT, Edge.LINK
+    # Vehicle states.
+    ON_EDGE, QUEUED, FINISHED = 0, 1, 2
+    # (name, dtype, fill value) of the per-vehicle arrays.
+    # ptr is the position in routes of the current edge (or of the edge a queued vehicle waits for).
+    # seq is the spawn order, which decides the order of simultaneous queue joins.
+    vehicle_arrays = (
+        ('seq', np.int64, 0),
+        ('ptr', np.int32, 0),
+        ('route_start', np.int32, 0),
+        ('route_len', np.int16, 0),
+        ('timer', np.int32, 0),
+        ('state', np.int8, FINISHED),
+        ('cum_wait_time', np.int32, 0),
+        ('start_time', np.int32, 0),
+        ('finish_time', np.int32, -1),
+        ('min_travel_time', np.int32, 0),
+        ('origin', np.int16, 0),
+        ('destination', np.int16, 0),
+    )
+    image_path = 'images/vehicle_opaque_50.png'
+
+    def __init__(self, graph, capacity=1024):
+        self.graph = graph
+        self.compile_edges()
+        self.compile_queues()
+        # num_vehicles is the number of slots ever used, free the slots of retired vehicles.
+        self.num_vehicles = 0
+        self.num_spawned = 0
+        self.num_discharged = 0
+        self.free = []
+        self.capacity = 0
+        self.routes = np.zeros(0, dtype=np.int32)
+        self.route_size = 0
+        self.route_garbage = 0
+        self.grow(capacity)
+        # (name, phase(time, spawns, screen)) in the order step runs them.
+        self.phases = (('intersections', self.step_intersections), ('nodes', self.step_nodes),
+                       ('spawn', self.step_spawn), ('vehicles', self.step_vehicles), ('render', self.step_render))
+
+    def compile_edges(self):
+        """
+        Flattens Graph.edges into per-edge arrays indexed by Edge.id.
+        """
+        edges = self.graph.edges
+        self.delta_t = np.array([edge.delta_t for edge in edges], dtype=np.int32)
+        self.end_is_fringe = np.array([edge.end_node.is_fringe for edge in edges], dtype=bool)
+        self.kind = np.array([edge.kind for edge in edges], dtype=np.int8)
+        tables = self.graph.tables
+        self.start_xy = tables.edge_start_xy.copy()
+        self.end_xy = tables.edge_end_xy.copy()
+        self.theta = tables.edge_theta.copy()
+        self.edge_origin = self.graph.edge_origin.copy()
+        self.edge_destination = self.graph.edge_destination.copy()
+        self.links = self.graph.links
+
+    def compile_queues(self):
+        """
+        One FIFO queue per (incoming intermediate node, lt/gs) pair.
+        queue_of_edge maps lt and gs edges to the queue of vehicles waiting to enter them.
+        """
+        idx_2 = Intersection.idx_2
+        node_dir = self.graph.tables.node_dir
+        self.queue_nodes = [node for node in self.graph.interm_nodes if node.is_incoming]
+        self.queue_of_edge = np.full(len(self.graph.edges), -1, dtype=np.int32)
+        queue_dir = []
+        queue_turn = []
+        queue_v_star = []
+        for node in self.queue_nodes:
+            for turn, edge in (('lt', node.lt_edge), ('gs', node.gs_edge)):
+                self.queue_of_edge[edge.id] = len(queue_dir)
+                queue_dir.append(node_dir[node.id])
+                queue_turn.append(idx_2[turn])
+                queue_v_star.append(node.v_star)
+        self.queue_node = np.repeat(np.arange(len(self.queue_nodes)), 2)
+        self.queue_dir = np.array(queue_dir, dtype=np.intp)
+        self.queue_turn = np.array(queue_turn, dtype=np.intp)
+        self.queue_v_star = np.array(queue_v_star, dtype=np.int32)
+        self.allocate_queues(len(queue_dir))
+
+    def allocate_queues(self, num_queues, capacity=16):
+        """
+        Empty ring buffers of vehicle slots, one row per queue. Queue q holds
+        queue_buffer[q, (queue_head[q] + k) % queue_capacity] for k < queue_length[q], oldest first.
+        """
+        self.queue_capacity = capacity
+        self.queue_buffer = np.zeros((num_queues, capacity), dtype=np.int64)
+        self.queue_head = np.zeros(num_queues, dtype=np.int64)
+        self.queue_length = np.zeros(num_queues, dtype=np.int32)
+
+    def grow_queues(self, capacity):
+        """
+        Resizes the ring buffers to hold at least capacity vehicles per queue.
+        """
+        capacity = max(capacity, 2 * self.queue_capacity)
+        buffer = np.zeros((len(self.queue_buffer), capacity), dtype=np.int64)
+        positions = (self.queue_head[:, None] + np.arange(self.queue_capacity)) % self.queue_capacity
+        buffer[:, :self.queue_capacity] = np.take_along_axis(self.queue_buffer, positions, axis=1)
+        self.queue_buffer = buffer
+        self.queue_head[:] = 0
+        self.queue_capacity = capacity
+
+    def queue_front(self, queues, counts):
+        """
+        Slots of the first counts[k] vehicles of every queue queues[k], queue by queue, oldest first.
+        """
+        counts = np.asarray(counts)
+        offsets = np.arange(counts.max(initial=0))
+        positions = (self.queue_head[queues][:, None] + offsets) % self.queue_capacity
+        return self.queue_buffer[np.asarray(queues)[:, None], positions][offsets < counts[:, None]]
+
+    def enqueue(self, slots, queue_ids):
+        """
+        Appends every slot to the tail of its queue; slots joining the same queue keep their given order.
+        """
+        if len(slots) == 0:
+            return
+        by_queue = np.argsort(queue_ids, kind='stable')
+        q = queue_ids[by_queue]
+        # Rank of every slot among those joining the same queue, q being sorted.
+        tails = self.queue_length[q] + (np.arange(len(q)) - np.searchsorted(q, q))
+        needed = int(tails.max()) + 1
+        if needed > self.queue_capacity:
+            self.grow_queues(needed)
+        self.queue_buffer[q, (self.queue_head[q] + tails) % self.queue_capacity] = slots[by_queue]
+        np.add.at(self.queue_length, q, 1)
+
+    def grow(self, capacity):
+        """
+        Resizes the per-vehicle arrays to hold at least capacity vehicles.
+        """
+        capacity = max(capacity, 2 * self.capacity)
+        n = self.num_vehicles
+        for name, dtype, fill in self.vehicle_arrays:
+            array = np.full(capacity, fill, dtype=dtype)
+            if self.capacity:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def append_route(self, edge_ids):
+        size = self.route_size + len(edge_ids)
+        if size > len(self.routes):
+            routes = np.zeros(max(size, 2 * len(self.routes)), dtype=np.int32)
+            routes[:self.route_size] = self.routes[:self.route_size]
+            self.routes = routes
+        self.routes[self.route_size:size] = edge_ids
+        start = self.route_size
+        self.route_size = size
+        return start
+
+    def compact_routes(self):
+        """
+        Drops the routes of retired vehicles from routes and rebases the live vehicles' pointers.
+        """
+        n = self.num_vehicles
+        live = np.flatnonzero(self.state[:n] != ArrayEngine.FINISHED)
+        lengths = self.route_len[live].astype(np.int64)
+        new_start = np.cumsum(lengths) - lengths
+        size = int(lengths.sum())
+        offsets = np.repeat(self.route_start[live] - new_start, lengths) + np.arange(size)
+        routes = np.zeros(max(size, len(self.routes) // 2), dtype=np.int32)
+        routes[:size] = self.routes[offsets]
+        self.ptr[live] += new_start - self.route_start[live]
+        self.route_start[live] = new_start
+        self.routes = routes
+        self.route_size = size
+        self.route_garbage = 0
+
+    @property
+    def num_active(self):
+        """
+        Number of vehicles spawned but not finished yet.
+        """
+        return self.num_vehicles - len(self.free)
+
+    def spawn(self, start_node, end_node, time):
+        """
+        Adds a vehicle at the start of start_node.to_edge, routed like Vehicle does.
+        :return: slot of the new vehicle
+        """
+        _, _, edge_ids, min_travel_time = self.graph.route_service.route(start_node, end_node)
+        self.links.enter(edge_ids[0])
+        return self.add_vehicle(edge_ids, min_travel_time, time)
+
+    def add_vehicle(self, edge_ids, min_travel_time, time, seq=None):
+        """
+        Adds a vehicle at the start of the first edge of edge_ids.
+        :param seq: spawn order of the vehicle, the next one if None.
+        :return: slot of the new vehicle
+        """
+        if self.free:
+            v = self.free.pop()
+        else:
+            if self.num_vehicles == self.capacity:
+                self.grow(self.capacity + 1)
+            v = self.num_vehicles
+            self.num_vehicles += 1
+        self.seq[v] = self.num_spawned if seq is None else seq
+        self.route_start[v] = self.ptr[v] = self.append_route(edge_ids)
+        self.route_len[v] = len(edge_ids)
+        self.timer[v] = 0
+        self.state[v] = ArrayEngine.ON_EDGE
+        self.cum_wait_time[v] = 0
+        self.start_time[v] = time
+        self.min_travel_time[v] = min_travel_time
+        self.origin[v] = self.edge_origin[edge_ids[0]]
+        self.destination[v] = self.edge_destination[edge_ids[-1]]
+        self.num_spawned += 1
+        return v
+
+    def retire(self, finished):
+        """
+        Moves finished vehicles to graph.trips and frees their slots.
+        :param finished: slots of vehicles whose state is FINISHED and finish_time is set
+        """
+        if len(finished) == 0:
+            return
+        self.graph.trips.extend(self.seq[finished], self.start_time[finished], self.finish_time[finished],
+                                self.min_travel_time[finished], self.cum_wait_time[finished])
+        self.graph.stats.add_trips(self.origin[finished], self.destination[finished], self.start_time[finished],
+                                   self.finish_time[finished], self.min_travel_time[finished],
+                                   self.cum_wait_time[finished])
+        self.release(finished)
+
+    def release(self, slots):
+        """
+        Frees the given slots without recording a trip.
+        """
+        self.state[slots] = ArrayEngine.FINISHED
+        self.free.extend(slots.tolist())
+        self.route_garbage += int(self.route_len[slots].sum())
+        if self.route_garbage > max(self.route_size // 2, 4096):
+            self.compact_routes()
+
+    def get_state(self):
+        """
+        Copy of the vehicle and queue state.
+        :return: (JSON-serializable dict, dict of name -> NumPy array), restored by set_state
+        """
+        n = self.num_vehicles
+        meta = {'num_vehicles': n, 'num_spawned': self.num_spawned, 'capacity': self.capacity,
+                'route_capacity': len(self.routes), 'route_garbage': self.route_garbage}
+        arrays = {name: getattr(self, name)[:n].copy() for name, _, _ in self.vehicle_arrays}
+        arrays['free'] = np.array(self.free, dtype=np.int64)
+        arrays['routes'] = self.routes[:self.route_size].copy()
+        arrays['queue_length'] = self.queue_length.copy()
+        arrays['queue_vehicles'] = self.queue_front(np.arange(len(self.queue_length)), self.queue_length)
+        return meta, arrays
+
+    def set_state(self, meta, arrays):
+        n = meta['num_vehicles']
+        self.num_vehicles = 0
+        self.capacity = 0
+        self.grow(meta['capacity'])
+        self.num_vehicles = n
+        for name, _, _ in self.vehicle_arrays:
+            getattr(self, name)[:n] = arrays[name]
+        self.num_spawned = meta['num_spawned']
+        self.free = arrays['free'].tolist()
+        self.route_size = len(arrays['routes'])
+        self.routes = np.zeros(max(meta['route_capacity'], self.route_size), dtype=np.int32)
+        self.routes[:self.route_size] = arrays['routes']
+        self.route_garbage = meta['route_garbage']
+        lengths = arrays['queue_length']
+        self.allocate_queues(len(lengths), capacity=max(16, int(lengths.max(initial=0))))
+        self.enqueue(np.array(arrays['queue_vehicles'], dtype=np.int64), np.repeat(np.arange(len(lengths)), lengths))
+
+    def signal_modes(self):
+        """
+        Current mode of the intersection of every queue node.
+        """
+        return self.graph.signals.node_modes
+
+    def discharge(self):
+        """
+        Node phase: releases up to v_star vehicles from every queue with a green light, for all queues at once.
+        With limited link capacities, a queue stops at its first vehicle whose next link is full.
+        :return: slots of the released vehicles
+        """
+        modes = self.signal_modes()
+        green = Intersection.traffic_light[modes[self.queue_node], self.queue_dir, self.queue_turn]
+        queues = np.flatnonzero(green & (self.queue_length > 0))
+        counts = np.minimum(self.queue_v_star[queues], self.queue_length[queues])
+        released = self.queue_front(queues, counts)
+        links = self.links
+        if links.is_limited:
+            links.refresh()
+            # Released vehicles are ordered by queue, so links serve the queues of their upstream nodes in node order.
+            admitted = links.admit_all(self.routes[self.ptr[released]])
+            counts = np.bincount(np.repeat(np.arange(len(queues)), counts)[admitted], minlength=len(queues))
+            released = released[admitted]
+        self.queue_head[queues] = (self.queue_head[queues] + counts) % self.queue_capacity
+        self.queue_length[queues] -= counts
+        self.state[released] = ArrayEngine.ON_EDGE
+        self.timer[released] = 0
+        self.num_discharged += len(released)
+        links.move_all(self.routes[self.ptr[released] - 1], self.routes[self.ptr[released]])
+        return released
+
+    def advance(self, time):
+        """
+        Vehicle phase: waits, edge traversal and arrivals for every vehicle in one pass.
+        """
+        n = self.num_vehicles
+        state = self.state[:n]
+        links = self.links
+        if links.is_limited:
+            links.refresh()
+        self.cum_wait_time[:n][state == ArrayEngine.QUEUED] += 1
+        moving = np.flatnonzero(state == ArrayEngine.ON_EDGE)
+        self.timer[moving] += 1
+        edges = self.routes[self.ptr[moving]]
+        is_arrived = self.timer[moving] == self.delta_t[edges]
+        arrived = moving[is_arrived]
+        arrived_edges = edges[is_arrived]
+        if len(arrived) == 0:
+            return
+        is_finished = self.end_is_fringe[arrived_edges]
+        # Slots are reused, so finished trips are sorted back into spawn order, as the other engines retire them.
+        order = np.argsort(self.seq[arrived[is_finished]], kind='stable')
+        finished = arrived[is_finished][order]
+        finished_edges = arrived_edges[is_finished][order]
+        self.state[finished] = ArrayEngine.FINISHED
+        self.finish_time[finished] = time + 1
+        recorder = self.graph.recorder
+        if recorder is not None:
+            recorder.extend(time, recorder.FINISH, self.seq[finished], finished_edges)
+        links.leave_all(finished_edges)
+        self.retire(finished)
+        passing = arrived[~is_finished]
+        passed_edges = arrived_edges[~is_finished]
+        next_edges = self.routes[self.ptr[passing] + 1]
+        if links.is_limited:
+            passing, passed_edges, next_edges = self.hold_right_turns(passing, passed_edges, next_edges)
+        self.ptr[passing] += 1
+        is_queued = self.kind[next_edges] <= ArrayEngine.GS
+        self.timer[passing[~is_queued]] = 0
+        links.move_all(passed_edges[~is_queued], next_edges[~is_queued])
+        queued = passing[is_queued]
+        if recorder is not None:
+            recorder.extend(time, recorder.ENTER, self.seq[passing[~is_queued]], next_edges[~is_queued])
+            recorder.extend(time, recorder.QUEUE, self.seq[queued], next_edges[is_queued])
+        self.state[queued] = ArrayEngine.QUEUED
+        # Vehicles join their queues in spawn order, as in the object loop.
+        order = np.argsort(self.seq[queued], kind='stable')
+        self.enqueue(queued[order], self.queue_of_edge[next_edges[is_queued][order]])
+
+    def hold_right_turns(self, passing, passed_edges, next_edges):
+        """
+        Keeps the vehicles turning right into a full link at the end of their edge until the next tick,
+        serving the right turns into every link in spawn order.
+        :return: passing, passed_edges and next_edges without the held vehicles
+        """
+        turning = np.flatnonzero(self.kind[next_edges] == ArrayEngine.RT)
+        turning = turning[np.argsort(self.seq[passing[turning]], kind='stable')]
+        held = turning[~self.links.admit_all(next_edges[turning])]
+        if len(held) == 0:
+            return passing, passed_edges, next_edges
+        slots = passing[held]
+        self.timer[slots] = self.delta_t[passed_edges[held]] - 1
+        self.cum_wait_time[slots] += 1
+        keep = np.ones(len(passing), dtype=bool)
+        keep[held] = False
+        return passing[keep], passed_edges[keep], next_edges[keep]
+
+    def step(self, time, spawns=(), screen=None):
+        """
+        One tick: intersection phase, node phase, spawning, vehicle phase, then drawing.
+        :param spawns: (start_node, end_node) pairs of vehicles entering at this tick
+        """
+        for _, phase in self.phases:
+            phase(time, spawns, screen)
+
+    def step_intersections(self, time, spawns, screen):
+        self.graph.signals.step(time, screen=screen)
+        if self.graph.recorder is not None:
+            self.graph.record_phases(time)
+
+    def step_nodes(self, time, spawns, screen):
+        released = self.discharge()
+        recorder = self.graph.recorder
+        if recorder is not None:
+            recorder.extend(time, recorder.DISCHARGE, self.seq[released], self.routes[self.ptr[released]])
+
+    def step_spawn(self, time, spawns, screen):
+        recorder = self.graph.recorder
+        for start_node, end_node in spawns:
+            v = self.spawn(start_node, end_node, time)
+            if recorder is not None:
+                recorder.record(time, recorder.ENTER, self.seq[v], self.routes[self.ptr[v]])
+
+    def step_vehicles(self, time, spawns, screen):
+        self.graph.stats.add_waits(self.queue_length)
+        self.advance(time)
+
+    def step_render(self, time, spawns, screen):
+        if screen is not None:
+            self.blit_network(screen)
+            self.blit(screen)
+
+    def timers(self, ids):
+        """
+        Number of ticks the given on-edge vehicles have spent on their current edge.
+        """
+        return self.timer[ids]
+
+    def locations(self):
+        """
+        Display coordinates of all vehicles that have not finished.
+        :return: (vehicle ids, (k, 2) array of locations, current edge ids)
+        """
+        n = self.num_vehicles
+        active = np.flatnonzero(self.state[:n] != ArrayEngine.FINISHED)
+        edges = self.routes[self.ptr[active]]
+        progress = np.where(self.state[active] == ArrayEngine.QUEUED, 0.0,
+                            self.timers(active) / self.delta_t[edges])[:, None]
+        locs = (1 - progress) * self.start_xy[edges] + progress * self.end_xy[edges]
+        return active, locs, edges
+
+    def blit_network(self, screen):
+        for node in self.graph.nodes:
+            node.blit(screen)
+        for edge in self.graph.edges:
+            edge.blit(screen)
+
+    def blit(self, screen):
+        _, locs, edges = self.locations()
+        for (x, y), theta in zip(locs.tolist(), self.theta[edges].tolist()):
+            center_blit(rotate_image(self.image_path, -theta-90), Location(x, y), screen)
@@ -0,0 +1,124 @@
+import numpy as np
+from components.graph import Graph
+from components.array_engine import ArrayEngine
+from components.trip_records import TripRecords
+from components.online_stats import OnlineStatistics
+from components.demand import destination_table
+
+__all__ = ['BatchEngine', 'BatchTrafficEnv']
+
+
+class BatchEngine(ArrayEngine):
+    """
+    ArrayEngine over num_envs independent copies of one grid.
+    Edge k of copy e has id e * num_edges + k and queue q of copy e has id e * num_queues + q,
+    so the vehicles of every copy share one set of arrays and are stepped together.
+    Signal modes come from the (num_envs, num_interm_inters) array modes instead of Intersection objects.
+    """
+    def __init__(self, graph, num_envs, capacity=1024):
+        self.num_envs = num_envs
+        super(BatchEngine, self).__init__(graph, capacity=capacity)
+        node_ids = [node.id for node in self.queue_nodes]
+        self.queue_node_inter = graph.tables.node_inter[node_ids] - len(graph.fringe_inters)
+        self.modes = np.zeros((num_envs, len(graph.interm_inters)), dtype=np.intp)
+
+    def compile_edges(self):
+        super(BatchEngine, self).compile_edges()
+        self.num_edges = len(self.graph.edges)
+        for name in ('delta_t', 'end_is_fringe', 'kind', 'theta', 'edge_origin', 'edge_destination'):
+            setattr(self, name, np.tile(getattr(self, name), self.num_envs))
+        for name in ('start_xy', 'end_xy'):
+            setattr(self, name, np.tile(getattr(self, name), (self.num_envs, 1)))
+        self.links = self.graph.links.tile(self.num_envs)
+
+    def compile_queues(self):
+        super(BatchEngine, self).compile_queues()
+        K = self.num_envs
+        self.num_queues = len(self.queue_length)
+        offsets = np.repeat(np.arange(K) * self.num_queues, self.num_edges)
+        queue_of_edge = np.tile(self.queue_of_edge, K)
+        self.queue_of_edge = np.where(queue_of_edge >= 0, queue_of_edge + offsets, -1).astype(np.int32)
+        self.queue_node = (np.arange(K)[:, None] * len(self.queue_nodes) + self.queue_node).ravel()
+        self.queue_dir = np.tile(self.queue_dir, K)
+        self.queue_turn = np.tile(self.queue_turn, K)
+        self.queue_v_star = np.tile(self.queue_v_star, K)
+        self.allocate_queues(K * self.num_queues)
+
+    def signal_modes(self):
+        return self.modes[:, self.queue_node_inter].ravel()
+
+
+class BatchTrafficEnv:
+    """
+    num_envs independent H x L grids stepped with one call, with one agent per intermediate intersection.
+    Actions are phase indices into Intersection.traffic_light, shape (num_envs, num_agents).
+    Observations are the lt/gs queue lengths of the four incoming nodes (ordered as
+    Intersection.idx_1) of every agent, shape (num_envs, num_agents, 4, 2), and the
+    current phases, shape (num_envs, num_agents).
+    The reward of every agent is minus the number of vehicles queued at its intersection.
+    """
+    def __init__(self, num_envs, H=3, L=3, horizon=30 * 60, spawn_period=1, seed=None):
+        self.num_envs = num_envs
+        self.horizon = horizon
+        self.spawn_period = spawn_period
+        self.graph = Graph(H, L, seed=seed)
+        self.num_agents = len(self.graph.interm_inters)
+        self.np_random = np.random.default_rng(seed)
+        self.origins = self.graph.is_outgoing_fringe_nodes
+        self.destinations = self.graph.is_incoming_fringe_nodes
+        self.destination_table = destination_table(self.graph)
+        self.reset()
+
+    def reset(self):
+        """
+        Starts a new episode in every copy, with empty grids and the trip counts and statistics of graph cleared.
+        """
+        # Only the aggregates of the episode's trips (over all copies) are kept, finished trips are not stored.
+        self.graph.trips = TripRecords(sink=TripRecords.discard)
+        self.graph.stats = OnlineStatistics.for_graph(self.graph)
+        self.engine = BatchEngine(self.graph, self.num_envs)
+        self.time = 0
+        return self.observe()
+
+    def spawn(self):
+        """
+        Spawns one vehicle in every copy, with origins and destinations drawn in one batch.
+        """
+        K = self.num_envs
+        origins = self.np_random.integers(len(self.origins), size=K)
+        destinations = self.destination_table[origins, self.np_random.integers(self.destination_table.shape[1], size=K)]
+        route = self.graph.route_service.route
+        num_edges = self.engine.num_edges
+        for env, (o, d) in enumerate(zip(origins.tolist(), destinations.tolist())):
+            _, _, edge_ids, min_travel_time = route(self.origins[o], self.destinations[d])
+            self.engine.links.enter(edge_ids[0] + env * num_edges)
+            self.engine.add_vehicle(edge_ids + env * num_edges, min_travel_time, self.time)
+
+    def observe(self):
+        queue_lengths = self.engine.queue_length.reshape(self.num_envs, self.num_agents, 4, 2).copy()
+        return queue_lengths, self.engine.modes.copy()
+
+    def step(self, actions, n_ticks=1):
+        """
+        Applies the phases in actions to every copy and advances all copies by n_ticks ticks (action repeat),
+        or until horizon. Raises ValueError once horizon is reached: call reset to start a new episode.
+        :return: (observation after the last tick, rewards of shape (num_envs, num_agents) summed over the ticks,
+                  dones of shape (num_envs,))
+        """
+        if self.time >= self.horizon:
+            raise ValueError(f"The episode ended at horizon {self.horizon}, call reset before stepping again.")
+        actions = np.asarray(actions)
+        if actions.shape != self.engine.modes.shape:
+            raise ValueError(f"actions should have shape {self.engine.modes.shape}, got {actions.shape}.")
+        self.engine.modes[:] = actions
+        queued = np.zeros((self.num_envs, self.num_agents), dtype=np.int64)
+        for _ in range(min(n_ticks, self.horizon - self.time)):
+            self.engine.discharge()
+            if self.time % self.spawn_period == 0:
+                self.spawn()
+            self.engine.advance(self.time)
+            self.time += 1
+            queued += self.engine.queue_length.reshape(self.num_envs, self.num_agents, 8).sum(axis=2)
+        observation = self.observe()
+        dones = np.full(self.num_envs, self.time >= self.horizon)
+        return observation, -queued, dones
@@ -0,0 +1,197 @@
+"""
+Benchmarks of process startup, Graph construction, headless stepping, spawning and rendering across grid sizes.
+Every result is written as one JSON object per line, so runs can be stored and compared over time.
+
+    python -m components.benchmark --size 3x3 10x10 25x25 50x50 --engine object array event --ticks 600 -o bench.jsonl
+
+Run from the repository root, the render scenario loads images/ and fonts/ relative to it.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+# Keep stdout machine-readable: pygame prints a banner on import unless this is set.
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+from components.graph import Graph
+from components.vehicle import Vehicle
+
+__all__ = ['bench_startup', 'bench_construct', 'bench_step', 'bench_spawn', 'bench_render', 'scenarios', 'run_benchmarks']
+
+
+def make_graph(H, L, engine, spawn_period=1, seed=0):
+    graph = Graph(H, L, engine=engine, seed=seed)
+    graph.spawn_period = spawn_period
+    graph.verbose = False
+    return graph
+
+
+# Run by bench_startup in a fresh interpreter, as a replication worker would.
+startup_script = """
+import json, sys, time
+start = time.perf_counter()
+from components.graph import Graph
+imported = time.perf_counter()
+H, L, engine, spawn_period, ticks = sys.argv[1:]
+graph = Graph(int(H), int(L), engine=engine, seed=0)
+graph.spawn_period = int(spawn_period)
+graph.verbose = False
+graph.t_sim = int(ticks)
+built = time.perf_counter()
+graph.run(until=int(ticks) - 1)
+end = time.perf_counter()
+print(json.dumps({'import_seconds': imported - start, 'construct_seconds': built - imported,
+                  'run_seconds': end - built, 'pygame_imported': 'pygame' in sys.modules}))
+"""
+
+
+def bench_startup(H, L, engine, spawn_period, ticks):
+    """
+    Wall time of a short run in a new Python process (interpreter start, imports, construction and ticks ticks),
+    the cost every process pool worker pays, with the import, construction and run times measured inside it.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    start = time.perf_counter()
+    process = subprocess.run([sys.executable, '-c', startup_script, str(H), str(L), engine, str(spawn_period), str(ticks)],
+                             capture_output=True, text=True, cwd=root, check=True)
+    seconds = time.perf_counter() - start
+    return dict({'seconds': seconds}, **json.loads(process.stdout))
+
+
+def bench_construct(H, L, engine, spawn_period, ticks):
+    """
+    Time to build the graph (intersections, nodes, edges, route service and engine tables).
+    """
+    start = time.perf_counter()
+    make_graph(H, L, engine, spawn_period)
+    return {'seconds': time.perf_counter() - start}
+
+
+def bench_step(H, L, engine, spawn_period, ticks):
+    """
+    Headless ticks per second over ticks ticks, spawning one vehicle every spawn_period ticks.
+    """
+    graph = make_graph(H, L, engine, spawn_period)
+    graph.t_sim = ticks
+    start = time.perf_counter()
+    graph.run(until=ticks - 1)
+    seconds = time.perf_counter() - start
+    num_active = graph.engine.num_active if graph.engine is not None else len(graph.vehicles)
+    return {'seconds': seconds, 'ticks_per_second': ticks / seconds,
+            'num_trips': len(graph.trips), 'num_active': num_active}
+
+
+def bench_spawn(H, L, engine, spawn_period, ticks):
+    """
+    Mean cost of one spawn (trip sampling, routing and vehicle creation) over ticks spawns, without stepping.
+    """
+    graph = make_graph(H, L, engine, spawn_period)
+    start = time.perf_counter()
+    for k in range(ticks):
+        start_node, end_node = graph.sample_trip()
+        if graph.engine is not None:
+            graph.engine.spawn(start_node, end_node, 0)
+        else:
+            graph.vehicles.append(Vehicle(k, start_node, end_node, graph=graph))
+    seconds = time.perf_counter() - start
+    return {'seconds': seconds, 'us_per_spawn': 1e6 * seconds / ticks}
+
+
+def bench_render(H, L, engine, spawn_period, ticks):
+    """
+    Frame times of Graph.step drawing to an off-screen 960 x 960 display, as in main.py.
+    """
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    import pygame
+    pygame.display.init()
+    pygame.font.init()
+    screen = pygame.display.set_mode((960, 960))
+    graph = make_graph(H, L, engine, spawn_period)
+    frame_times = np.zeros(ticks)
+    for k in range(ticks):
+        start = time.perf_counter()
+        screen.fill((0, 0, 0))
+        graph.step(screen=screen)
+        frame_times[k] = time.perf_counter() - start
+    return {'seconds': float(frame_times.sum()), 'frame_ms_mean': 1e3 * float(frame_times.mean()),
+            'frame_ms_p95': 1e3 * float(np.percentile(frame_times, 95)), 'fps': ticks / float(frame_times.sum())}
+
+
+scenarios = {'startup': bench_startup, 'construct': bench_construct, 'step': bench_step, 'spawn': bench_spawn, 'render': bench_render}
+
+
+def peak_memory(function, *args):
+    """
+    Peak memory traced by tracemalloc (Python objects and NumPy arrays) while running function(*args).
+    """
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'platform': platform.platform(), 'commit': commit,
+            'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds')}
+
+
+def run_benchmarks(names, sizes, engines, spawn_periods, ticks, memory=True):
+    """
+    Runs every scenario in names for every combination of size, engine and spawn period.
+    :param sizes: list of (H, L).
+    :param ticks: simulated ticks (step), spawns (spawn) or frames (render) per scenario.
+    :param memory: also measure peak memory in a second, separately timed run.
+    :return: generator of result dicts.
+    """
+    for name in names:
+        for H, L in sizes:
+            for engine in engines:
+                for spawn_period in spawn_periods:
+                    args = (H, L, engine, spawn_period, ticks)
+                    row = {'scenario': name, 'H': H, 'L': L, 'engine': engine,
+                           'spawn_period': spawn_period, 'ticks': ticks}
+                    row.update(scenarios[name](*args))
+                    # The startup run happens in another process, out of reach of tracemalloc.
+                    if memory and name != 'startup':
+                        row['peak_memory_bytes'] = peak_memory(scenarios[name], *args)
+                    yield row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark Graph construction, stepping, spawning and rendering.')
+    parser.add_argument('--scenario', nargs='+', default=list(scenarios), choices=list(scenarios))
+    parser.add_argument('--size', nargs='+', default=['3x3', '10x10', '25x25', '50x50'], help='grid sizes as HxL')
+    parser.add_argument('--engine', nargs='+', default=['object', 'array', 'event'], choices=list(Graph.engines))
+    parser.add_argument('--spawn-period', nargs='+', type=int, default=[1], help='ticks between spawns')
+    parser.add_argument('--ticks', type=int, default=600, help='ticks, spawns or frames per scenario')
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('-o', '--output', default=None, help='append the results to this JSON lines file')
+    args = parser.parse_args(argv)
+    sizes = [tuple(int(x) for x in size.lower().split('x')) for size in args.size]
+    env = environment()
+    file = open(args.output, 'a') if args.output is not None else sys.stdout
+    try:
+        for row in run_benchmarks(args.scenario, sizes, args.engine, args.spawn_period, args.ticks,
+                                  memory=not args.no_memory):
+            file.write(json.dumps(dict(row, **env)) + '\n')
+            file.flush()
+    finally:
+        if file is not sys.stdout:
+            file.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,37 +1,57 @@
-import pygame
-from pygame.sprite import Sprite
 from components.methods.methods import *
 
 __all__ = ['Component', 'Intersection', 'Node', 'Edge', 'Graph']
 
 
-class Component(Sprite):
+class Component:
     """
     Base class for all components needed in the Congestion Control Simulation.
+    Simulation state lives on the component itself, while display assets
+    (images, masks, fonts) are only loaded the first time it is drawn.
+    Components that exist in large numbers (Node, Edge, Vehicle) declare __slots__.
+    Locations and colors are plain tuples, so components can be simulated without importing pygame.
     """
+    __slots__ = ('time', 'init_time', 'image_path', 'image', 'display_image', 'width', 'height', 'rect', 'mask')
     # Static variables
     # (i, j) : i = distance from top, j = distance from left
     tup_dir_dict = {'E':(0,1), 'N':(-1,0), 'W':(0,-1), 'S':(1,0)}
     op_dir_dict = {'E':'W', 'N':'S', 'W':'E', 'S':'N'}
     lt_dir_dict = {'E':'S', 'N':'E', 'W':'N', 'S':'W'}
     rt_dir_dict = {'E':'N', 'N':'W', 'W':'S', 'S':'E'}
+    # The same tables with directions coded as integers (in the order of Intersection.idx_1),
+    # for code that runs per tick or per vehicle. See also TransitionTables.
+    dirs = ('E', 'N', 'W', 'S')
+    dir_codes = {'E':0, 'N':1, 'W':2, 'S':3}
+    tup_dir_codes = ((0,1), (-1,0), (0,-1), (1,0))
+    op_dir_codes = (2, 3, 0, 1)
+    lt_dir_codes = (3, 0, 1, 2)
+    rt_dir_codes = (1, 2, 3, 0)
 
     def __init__(self, time=0):
-        super(Component, self).__init__()
         self.time = time
         self.init_time = time
+        self.image_path = None
+        self.image = None
 
     def set_image(self, path=None):
         """
-        Sets display image and location.
+        Sets the display image path. The image itself is loaded lazily by load_image.
         """
         if path is not None:
-            self.image = pygame.image.load(path)
-            self.display_image = self.image
-            self.width = self.image.get_width()
-            self.height = self.image.get_height()
+            self.image_path = path
+            self.image = None
+
+    def load_image(self):
+        """
+        Loads display image and location from the shared asset cache.
+        Called on first draw, so headless runs never touch the disk.
+        """
+        self.image = load_image(self.image_path)
+        self.display_image = self.image
+        self.width = self.image.get_width()
+        self.height = self.image.get_height()
         self.rect = center_rect(self)
-        self.mask = pygame.mask.from_surface(self.display_image)
+        self.mask = load_mask(self.image_path)
 
     def blit(self, screen):
         pass
@@ -39,4 +59,4 @@ class Component(Sprite):
     def step(self, action=None, screen=None):
         self.time += 1
         if screen is not None:
-            self.blit(screen)
+            self.blit(screen)
\ No newline at end of file
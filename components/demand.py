@@ -0,0 +1,287 @@
+import numpy as np
+
+__all__ = ['Demand', 'PeriodicDemand', 'PoissonDemand', 'TraceDemand', 'PiecewiseRate', 'destination_table',
+           'piecewise_rate']
+
+
+def destination_table(graph):
+    """
+    Destinations of every origin as indices in graph.is_incoming_fringe_nodes: row k lists the incoming
+    fringe nodes not at the intersection of graph.is_outgoing_fringe_nodes[k], in the order of Graph.sample_trip.
+    Every fringe intersection has one incoming node, so all rows have the same length.
+    """
+    return np.array([[k for k, node in enumerate(graph.is_incoming_fringe_nodes) if node.inter is not origin.inter]
+                     for origin in graph.is_outgoing_fringe_nodes], dtype=np.intp)
+
+
+class PiecewiseRate:
+    """
+    Rate function of piecewise_rate, kept as its breakpoints so that it can be saved in Graph snapshots.
+    """
+    def __init__(self, times, rates, period=None):
+        self.times = np.asarray(times)
+        self.rates = np.asarray(rates, dtype=float)
+        self.period = period
+
+    def __call__(self, ticks):
+        if self.period is not None:
+            ticks = ticks % self.period
+        return self.rates[np.searchsorted(self.times, ticks, side='right') - 1]
+
+
+def piecewise_rate(times, rates, period=None):
+    """
+    Time-varying rate for PoissonDemand that is rates[k] from tick times[k] until the next breakpoint.
+    :param times: increasing ticks, starting with 0.
+    :param period: if given, the profile repeats every period ticks (e.g. a daily cycle).
+    """
+    return PiecewiseRate(times, rates, period=period)
+
+
+class Demand:
+    """
+    Vehicle arrivals of a Graph, set as graph.demand in place of one Graph.sample_trip every spawn_period ticks.
+    Arrivals are generated lazily, chunk_ticks ticks at a time, as (time, origin, destination) arrays with
+    origins indexing graph.is_outgoing_fringe_nodes and destinations graph.is_incoming_fringe_nodes.
+    Origins, destinations and the shuffles choosing every vehicle's shortest route are drawn from the
+    demand's own NumPy Generator, so a run is reproducible from the demand seed and the graph seed together.
+    Attach it with Graph.set_demand. The demands of this module are saved in Graph snapshots with their
+    generator state, so restored graphs draw the same arrivals and routes.
+    Subclasses implement generate, and get_params and from_params to be saved.
+    """
+    name = None
+
+    def __init__(self, graph, seed=None, chunk_ticks=1800):
+        self.graph = graph
+        self.rng = np.random.default_rng(seed)
+        self.chunk_ticks = chunk_ticks
+        self.origins = graph.is_outgoing_fringe_nodes
+        self.destinations = graph.is_incoming_fringe_nodes
+        self.destination_table = destination_table(graph)
+        self.times = np.zeros(0, dtype=np.int64)
+        self.origin_ids = np.zeros(0, dtype=np.intp)
+        self.destination_ids = np.zeros(0, dtype=np.intp)
+        # Arrivals before position have been spawned (or skipped); ticks before generated_until are generated.
+        self.position = 0
+        self.generated_until = 0
+
+    def generate(self, start, end):
+        """
+        Arrivals of ticks start..end-1.
+        :return: (times, origins, destinations) arrays, sorted by time
+        """
+        raise NotImplementedError
+
+    def get_params(self):
+        """
+        Arguments from_params rebuilds the demand from, before any arrival is generated.
+        :return: (JSON-serializable dict, dict of name -> NumPy array)
+        """
+        raise NotImplementedError
+
+    @classmethod
+    def from_params(cls, graph, meta, arrays, chunk_ticks):
+        raise NotImplementedError
+
+    def get_state(self):
+        """
+        Parameters, generator state and pending arrivals, restored by from_state.
+        :return: (JSON-serializable dict, dict of name -> NumPy array)
+        """
+        params, params_arrays = self.get_params()
+        meta = {'params': params, 'chunk_ticks': self.chunk_ticks, 'position': self.position,
+                'generated_until': self.generated_until, 'rng_state': self.rng.bit_generator.state}
+        arrays = {'params/' + name: array for name, array in params_arrays.items()}
+        arrays.update(times=self.times, origin_ids=self.origin_ids, destination_ids=self.destination_ids)
+        return meta, arrays
+
+    @classmethod
+    def from_state(cls, graph, meta, arrays):
+        params = {name[len('params/'):]: np.array(array) for name, array in arrays.items() if name.startswith('params/')}
+        demand = cls.from_params(graph, meta['params'], params, meta['chunk_ticks'])
+        demand.rng.bit_generator.state = meta['rng_state']
+        demand.times = np.array(arrays['times'])
+        demand.origin_ids = np.array(arrays['origin_ids'])
+        demand.destination_ids = np.array(arrays['destination_ids'])
+        demand.position, demand.generated_until = meta['position'], meta['generated_until']
+        return demand
+
+    def sample_destinations(self, origins):
+        """
+        Uniformly drawn destination of every origin, as Graph.sample_trip draws them.
+        """
+        columns = self.rng.integers(self.destination_table.shape[1], size=len(origins))
+        return self.destination_table[origins, columns]
+
+    def extend(self):
+        """
+        Generates the next chunk and drops the arrivals already spawned.
+        """
+        start = self.generated_until
+        times, origins, destinations = self.generate(start, start + self.chunk_ticks)
+        self.times = np.concatenate([self.times[self.position:], np.asarray(times, dtype=np.int64)])
+        self.origin_ids = np.concatenate([self.origin_ids[self.position:], np.asarray(origins, dtype=np.intp)])
+        self.destination_ids = np.concatenate([self.destination_ids[self.position:],
+                                               np.asarray(destinations, dtype=np.intp)])
+        self.position = 0
+        self.generated_until = start + self.chunk_ticks
+
+    def next_time(self, time, until):
+        """
+        First tick at or after time with an arrival, or None if there is none up to until.
+        """
+        while True:
+            k = self.position + int(np.searchsorted(self.times[self.position:], time))
+            if k < len(self.times):
+                return int(self.times[k])
+            if self.generated_until > until:
+                return None
+            self.extend()
+
+    def spawns(self, time):
+        """
+        (start_node, end_node) pairs of the arrivals at tick time.
+        Arrivals of earlier ticks that were never asked for are dropped.
+        """
+        while self.generated_until <= time:
+            self.extend()
+        times = self.times
+        start = self.position + int(np.searchsorted(times[self.position:], time))
+        end = start + int(np.searchsorted(times[start:], time, side='right'))
+        self.position = end
+        origins, destinations = self.origins, self.destinations
+        return [(origins[o], destinations[d]) for o, d in zip(self.origin_ids[start:end].tolist(),
+                                                             self.destination_ids[start:end].tolist())]
+
+
+class PeriodicDemand(Demand):
+    """
+    One vehicle every period ticks, as Graph.spawn_period, with origins drawn uniformly
+    (or with the given weights) and destinations uniformly among the other fringe intersections.
+    """
+    name = 'periodic'
+
+    def __init__(self, graph, period=1, origin_weights=None, seed=None, chunk_ticks=1800):
+        super(PeriodicDemand, self).__init__(graph, seed=seed, chunk_ticks=chunk_ticks)
+        self.period = period
+        self.origin_weights = None
+        if origin_weights is not None:
+            self.origin_weights = np.asarray(origin_weights, dtype=float) / np.sum(origin_weights)
+
+    def generate(self, start, end):
+        times = np.arange(-(-start // self.period) * self.period, end, self.period)
+        origins = self.rng.choice(len(self.origins), size=len(times), p=self.origin_weights)
+        return times, origins, self.sample_destinations(origins)
+
+    def get_params(self):
+        arrays = {} if self.origin_weights is None else {'origin_weights': self.origin_weights}
+        return {'period': self.period}, arrays
+
+    @classmethod
+    def from_params(cls, graph, meta, arrays, chunk_ticks):
+        demand = cls(graph, period=meta['period'], chunk_ticks=chunk_ticks)
+        # Already normalized, set as is so that the draws do not change.
+        demand.origin_weights = arrays.get('origin_weights')
+        return demand
+
+
+class PoissonDemand(Demand):
+    """
+    Poisson arrivals with a constant or time-varying rate.
+    :param rate: expected vehicles per tick over the whole grid, or a function of an array of ticks
+                 returning the rate at every tick (see piecewise_rate).
+    :param od: optional (origins, destinations) matrix of relative OD weights; pairs of nodes at the same
+               intersection must have weight 0. Without it, origins and destinations are drawn uniformly.
+    Only constant rates and PiecewiseRate can be saved in Graph snapshots.
+    """
+    name = 'poisson'
+
+    def __init__(self, graph, rate=1.0, od=None, seed=None, chunk_ticks=1800):
+        super(PoissonDemand, self).__init__(graph, seed=seed, chunk_ticks=chunk_ticks)
+        self.rate = rate
+        self.od = None
+        if od is not None:
+            od = np.asarray(od, dtype=float)
+            shape = (len(self.origins), len(self.destinations))
+            if od.shape != shape:
+                raise ValueError(f"od should have shape {shape}, got {od.shape}.")
+            same_inter = np.array([[origin.inter is destination.inter for destination in self.destinations]
+                                   for origin in self.origins])
+            if (od[same_inter] != 0).any() or (od < 0).any():
+                raise ValueError("od weights should be non-negative and 0 between nodes of the same intersection.")
+            self.od = od.ravel() / od.sum()
+
+    def generate(self, start, end):
+        ticks = np.arange(start, end)
+        rates = self.rate(ticks) if callable(self.rate) else np.full(len(ticks), self.rate)
+        times = np.repeat(ticks, self.rng.poisson(rates))
+        if self.od is None:
+            origins = self.rng.integers(len(self.origins), size=len(times))
+            return times, origins, self.sample_destinations(origins)
+        pairs = self.rng.choice(len(self.od), size=len(times), p=self.od)
+        return times, pairs // len(self.destinations), pairs % len(self.destinations)
+
+    def get_params(self):
+        arrays = {} if self.od is None else {'od': self.od}
+        if isinstance(self.rate, PiecewiseRate):
+            arrays.update(rate_times=self.rate.times, rate_values=self.rate.rates)
+            return {'rate': None, 'rate_period': self.rate.period}, arrays
+        if callable(self.rate):
+            raise ValueError('Cannot save a PoissonDemand with a rate function, use a constant rate or piecewise_rate.')
+        return {'rate': float(self.rate)}, arrays
+
+    @classmethod
+    def from_params(cls, graph, meta, arrays, chunk_ticks):
+        rate = meta['rate']
+        if rate is None:
+            rate = PiecewiseRate(arrays['rate_times'], arrays['rate_values'], period=meta['rate_period'])
+        demand = cls(graph, rate=rate, chunk_ticks=chunk_ticks)
+        # Already normalized and flattened, set as is so that the draws do not change.
+        demand.od = arrays.get('od')
+        return demand
+
+
+class TraceDemand(Demand):
+    """
+    Replays recorded arrivals, e.g. from counts of a real network or a previous run.
+    Only the route choices are drawn at random.
+    :param times, origins, destinations: equally long arrays, see Demand.
+    """
+    name = 'trace'
+
+    def __init__(self, graph, times, origins, destinations, seed=None, chunk_ticks=1800):
+        super(TraceDemand, self).__init__(graph, seed=seed, chunk_ticks=chunk_ticks)
+        order = np.argsort(times, kind='stable')
+        self.trace = tuple(np.asarray(column)[order] for column in (times, origins, destinations))
+        if len(order) and (self.trace[1].max() >= len(self.origins) or self.trace[2].max() >= len(self.destinations)):
+            raise ValueError("Trace origins or destinations out of range for this graph.")
+
+    @classmethod
+    def load(cls, graph, path, seed=None, chunk_ticks=1800):
+        """
+        Reads a trace from a .npz file with arrays time, origin and destination,
+        or from a CSV file with a time,origin,destination header.
+        """
+        if str(path).endswith('.npz'):
+            with np.load(path) as data:
+                columns = data['time'], data['origin'], data['destination']
+        else:
+            table = np.loadtxt(path, delimiter=',', skiprows=1, dtype=np.int64, ndmin=2)
+            columns = table[:, 0], table[:, 1], table[:, 2]
+        return cls(graph, *columns, seed=seed, chunk_ticks=chunk_ticks)
+
+    def generate(self, start, end):
+        times = self.trace[0]
+        lo, hi = np.searchsorted(times, [start, end])
+        return tuple(column[lo:hi] for column in self.trace)
+
+    def get_params(self):
+        return {}, dict(zip(('times', 'origins', 'destinations'), self.trace))
+
+    @classmethod
+    def from_params(cls, graph, meta, arrays, chunk_ticks):
+        return cls(graph, arrays['times'], arrays['origins'], arrays['destinations'], chunk_ticks=chunk_ticks)
+
+
+# Demands saved in Graph snapshots, by name.
+demands = {demand.name: demand for demand in (PeriodicDemand, PoissonDemand, TraceDemand)}
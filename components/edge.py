@@ -1,21 +1,34 @@
-import pygame
+import math
 from components.component import Component
 
 
 class Edge(Component):
+    __slots__ = ('id', 'start_node', 'end_node', 'is_inter', 'kind', 'delta_t', 'capacity', 'color', 'theta')
     delta_tL = 150  # timesteps
     delta_tI = 15   # timesteps
-    def __init__(self, start_node, end_node, is_inter, time=0):
+    # Movement a vehicle makes when entering the edge. Set by Node.connect_to_edge for internal edges.
+    LT, GS, RT, LINK = 0, 1, 2, 3
+    def __init__(self, start_node, end_node, is_inter, time=0, delta_t=None):
+        """
+        :param delta_t: ticks to traverse the edge, Edge.delta_tI or Edge.delta_tL by default.
+        """
         super(Edge, self).__init__(time=time)
+        self.id = None
         self.start_node = start_node
         self.end_node = end_node
         self.is_inter = is_inter
-        self.delta_t = Edge.delta_tI if is_inter else Edge.delta_tL
+        self.kind = None if is_inter else Edge.LINK
+        if delta_t is None:
+            delta_t = Edge.delta_tI if is_inter else Edge.delta_tL
+        self.delta_t = delta_t
+        # Maximum number of vehicles stored on a link, None for unlimited, see Graph.set_capacity.
+        self.capacity = None
         if start_node.inter is end_node.inter and not is_inter:
             raise AssertionError("Edge connects nodes internally but is_inter is False.")
         if start_node.inter is end_node.inter and not is_inter:
             raise AssertionError("Edge connects nodes from different intersections but is_inter is True.")
         self.set_color()
+        self.set_heading()
 
     def __eq__(self, other):
         return self.start_node == other.start_node and self.end_node == other.end_node
@@ -24,9 +37,17 @@ class Edge(Component):
         return 'from | ' + str(self.start_node) + '\nto | ' + str(self.end_node)
     
     def set_color(self):
-        self.color = pygame.color.Color(255, 255, 255)
+        self.color = (255, 255, 255)
+
+    def set_heading(self):
+        """
+        Polar angle (degrees) of the edge, used to pick the pre-rotated vehicle image.
+        """
+        start, end = self.start_node.loc, self.end_node.loc
+        self.theta = math.degrees(math.atan2(end.y - start.y, end.x - start.x))
     
     def blit(self, screen):
+        import pygame
         pygame.draw.line(screen, self.color, self.start_node.loc, self.end_node.loc, 3)
     
     def update(self, screen):
@@ -0,0 +1,217 @@
+import heapq
+import numpy as np
+from components.intersection import Intersection
+from components.array_engine import ArrayEngine
+
+__all__ = ['EventEngine']
+
+
+class EventEngine(ArrayEngine):
+    """
+    Discrete-event (next-event) vehicle engine.
+    Instead of counting every vehicle's timer up to Edge.delta_t, each vehicle schedules
+    its arrival at the end of the current edge, and queues schedule their own discharges
+    when the signal plan gives them green. Ticks without events cost nothing, so a run
+    only does work proportional to the number of edge arrivals, phase changes and discharges.
+    Uses the fixed-time signal plan of Intersection.step and matches the tick engines' statistics.
+    Other signal policies change phases at times that cannot be scheduled ahead, so they are rejected.
+    """
+    # Event phases, in the order the tick engines process them within a tick.
+    PHASE, DISCHARGE, ARRIVAL = 0, 1, 2
+    # entry : tick at which the vehicle's current edge timer was 0 after the vehicle phase,
+    #         so the vehicle reaches the end of the edge at entry + delta_t.
+    # queue_time : tick at which the vehicle joined its current queue.
+    vehicle_arrays = ArrayEngine.vehicle_arrays + (
+        ('entry', np.int32, 0),
+        ('queue_time', np.int32, 0),
+    )
+    cycle = 240
+    phase_length = 30
+
+    def __init__(self, graph, capacity=1024):
+        super(EventEngine, self).__init__(graph, capacity=capacity)
+        self.events = []
+        self.pending = np.zeros(len(self.queue_length), dtype=bool)
+        # Edges of the moves and exits of the current tick, applied to links in one batch at its end.
+        self.moved_from = []
+        self.moved_to = []
+        self.left = []
+        self.time = graph.time
+        self.schedule(graph.time, EventEngine.PHASE, 0)
+        self.phases = (('events', self.step_events), ('spawn', self.step_spawn),
+                       ('vehicles', self.step_vehicles), ('render', self.step_render))
+
+    def schedule(self, time, phase, key, order=0):
+        """
+        Events at the same tick are processed by phase, then by order (spawn order for arrivals).
+        """
+        heapq.heappush(self.events, (time, phase, order, key))
+
+    def next_time(self):
+        """
+        Tick of the earliest scheduled event, or None if nothing is scheduled.
+        """
+        return self.events[0][0] if self.events else None
+
+    def mode_at(self, time):
+        return (time % EventEngine.cycle) // EventEngine.phase_length
+
+    def is_green(self, q, mode):
+        return Intersection.traffic_light[mode, self.queue_dir[q], self.queue_turn[q]]
+
+    def request_discharge(self, q, time):
+        """
+        Schedules a discharge of queue q at time if it is green then and none is pending.
+        """
+        if not self.pending[q] and self.is_green(q, self.mode_at(time)):
+            self.pending[q] = True
+            self.schedule(time, EventEngine.DISCHARGE, q)
+
+    def change_phase(self, time):
+        signals = self.graph.signals
+        if not getattr(signals.policy, 'is_default', False):
+            raise ValueError('EventEngine only supports the default FixedTimePolicy, use a tick engine for other policies.')
+        if self.graph.links.is_limited:
+            raise ValueError('EventEngine does not support link capacities, use a tick engine.')
+        signals.step(time)
+        if self.graph.recorder is not None:
+            self.graph.record_phases(time)
+        for q in np.flatnonzero(self.queue_length).tolist():
+            self.request_discharge(q, time)
+        next_change = (time // EventEngine.phase_length + 1) * EventEngine.phase_length
+        self.schedule(next_change, EventEngine.PHASE, 0)
+
+    def discharge_queue(self, q, time):
+        self.pending[q] = False
+        length = int(self.queue_length[q])
+        if not length or not self.is_green(q, self.mode_at(time)):
+            return
+        k = min(int(self.queue_v_star[q]), length)
+        self.num_discharged += k
+        recorder = self.graph.recorder
+        for v in self.queue_front([q], [k]).tolist():
+            # Waited during every vehicle phase strictly between joining and leaving the queue.
+            self.cum_wait_time[v] += time - self.queue_time[v] - 1
+            self.moved_from.append(self.routes[self.ptr[v] - 1])
+            self.moved_to.append(self.routes[self.ptr[v]])
+            self.enter(v, time - 1)
+            if recorder is not None:
+                recorder.record(time, recorder.DISCHARGE, self.seq[v], self.routes[self.ptr[v]])
+        self.queue_head[q] = (self.queue_head[q] + k) % self.queue_capacity
+        self.queue_length[q] -= k
+        if self.queue_length[q]:
+            self.request_discharge(q, time + 1)
+
+    def enter(self, v, entry):
+        self.state[v] = ArrayEngine.ON_EDGE
+        self.entry[v] = entry
+        edge = self.routes[self.ptr[v]]
+        self.schedule(entry + int(self.delta_t[edge]), EventEngine.ARRIVAL, v, int(self.seq[v]))
+
+    def arrive(self, v, time):
+        """
+        :return: True if the vehicle left the grid.
+        """
+        recorder = self.graph.recorder
+        edge = self.routes[self.ptr[v]]
+        if self.end_is_fringe[edge]:
+            self.state[v] = ArrayEngine.FINISHED
+            self.finish_time[v] = time + 1
+            self.left.append(edge)
+            if recorder is not None:
+                recorder.record(time, recorder.FINISH, self.seq[v], edge)
+            return True
+        self.ptr[v] += 1
+        next_edge = self.routes[self.ptr[v]]
+        if self.kind[next_edge] <= ArrayEngine.GS:
+            q = self.queue_of_edge[next_edge]
+            self.state[v] = ArrayEngine.QUEUED
+            self.queue_time[v] = time
+            length = int(self.queue_length[q])
+            if length == self.queue_capacity:
+                self.grow_queues(length + 1)
+            self.queue_buffer[q, (self.queue_head[q] + length) % self.queue_capacity] = v
+            self.queue_length[q] += 1
+            self.request_discharge(q, time + 1)
+            if recorder is not None:
+                recorder.record(time, recorder.QUEUE, self.seq[v], next_edge)
+        else:
+            self.moved_from.append(edge)
+            self.moved_to.append(next_edge)
+            self.enter(v, time)
+            if recorder is not None:
+                recorder.record(time, recorder.ENTER, self.seq[v], next_edge)
+        return False
+
+    def spawn(self, start_node, end_node, time):
+        v = super(EventEngine, self).spawn(start_node, end_node, time)
+        self.enter(v, time - 1)
+        recorder = self.graph.recorder
+        if recorder is not None:
+            recorder.record(time, recorder.ENTER, self.seq[v], self.routes[self.ptr[v]])
+        return v
+
+    def get_state(self):
+        meta, arrays = super(EventEngine, self).get_state()
+        meta['time'] = self.time
+        # The heap is saved as is, so it is still a valid heap when restored.
+        arrays['events'] = np.array(self.events, dtype=np.int64).reshape(-1, 4)
+        arrays['pending'] = self.pending.copy()
+        return meta, arrays
+
+    def set_state(self, meta, arrays):
+        super(EventEngine, self).set_state(meta, arrays)
+        self.time = meta['time']
+        self.events = [tuple(event) for event in arrays['events'].tolist()]
+        self.pending = np.array(arrays['pending'], dtype=bool)
+
+    def step(self, time, spawns=(), screen=None):
+        """
+        Processes every event scheduled at time. Spawns are handled between the
+        discharges and the arrivals, as in the tick engines.
+        """
+        for _, phase in self.phases:
+            phase(time, spawns, screen)
+
+    def step_events(self, time, spawns, screen):
+        """
+        Phase changes and queue discharges scheduled at time.
+        """
+        # Queues do not change during the idle ticks skipped since the last processed one.
+        self.graph.stats.add_waits(self.queue_length, ticks=time - self.time)
+        events = self.events
+        while events and events[0][0] <= time and events[0][1] < EventEngine.ARRIVAL:
+            _, phase, _, key = heapq.heappop(events)
+            if phase == EventEngine.PHASE:
+                self.change_phase(time)
+            else:
+                self.discharge_queue(key, time)
+
+    def step_spawn(self, time, spawns, screen):
+        for start_node, end_node in spawns:
+            self.spawn(start_node, end_node, time)
+
+    def step_vehicles(self, time, spawns, screen):
+        self.graph.stats.add_waits(self.queue_length)
+        events = self.events
+        finished = []
+        while events and events[0][0] <= time:
+            v = heapq.heappop(events)[3]
+            if self.arrive(v, time):
+                finished.append(v)
+        self.retire(np.array(finished, dtype=np.intp))
+        if self.moved_from or self.left:
+            self.links.move_all(np.array(self.moved_from, dtype=np.intp), np.array(self.moved_to, dtype=np.intp))
+            self.links.leave_all(np.array(self.left, dtype=np.intp))
+            self.moved_from, self.moved_to, self.left = [], [], []
+        self.time = time + 1
+
+    def step_render(self, time, spawns, screen):
+        if screen is not None:
+            for inter in self.graph.inters:
+                inter.blit(screen)
+            self.blit_network(screen)
+            self.blit(screen)
+
+    def timers(self, ids):
+        return self.time - 1 - self.entry[ids]
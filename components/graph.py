@@ -3,20 +3,93 @@ from components.intersection import Intersection
 from components.node import Node
 from components.edge import Edge
 from components.vehicle import Vehicle
-import random
+from components.array_engine import ArrayEngine
+from components.event_engine import EventEngine
+from components.trip_records import TripRecords
+from components.route_service import RouteService
+from components.snapshot import save_snapshot, load_snapshot
+from components.instrumentation import Instrumentation
+from components.signals import SignalController, ExternalPolicy
+from components.online_stats import OnlineStatistics
+from components.links import LinkStorage
+from components.demand import demands
+from components.transitions import TransitionTables
 import numpy as np
+import random
 
 
 class Graph(Component):
-    def __init__(self, H, L, time=0):
+    """
+    Grid of H x L intermediate intersections surrounded by fringe intersections.
+    The graph runs headless whenever step is called without a screen;
+    images and fonts are only loaded once a component is actually drawn.
+    engine='object' steps one Vehicle object per vehicle, engine='array' keeps
+    vehicle state in NumPy arrays (see ArrayEngine) and engine='event' only does
+    work when a vehicle reaches the end of an edge, a phase changes or a queue
+    discharges (see EventEngine).
+    With seed=None the graph draws from the global random module, otherwise from its own
+    random.Random(seed), so that independent replications never share random state.
+    The full simulation state can be saved with save and restored with load (or copied in memory
+    with snapshot and from_snapshot), so that one warm-up can be branched into many runs.
+    v_star is the number of vehicles every lt/gs queue discharges per tick while green, and
+    delta_tL and delta_tI are the ticks to drive a link and to cross an intersection (Edge.delta_t).
+    Finished trips are kept in memory (trips) unless trip_sink is given: a callable receiving every full
+    chunk of trips instead (see TripRecords), e.g. TripRecords.discard to keep only the aggregates,
+    so that memory stays bounded however long the graph runs.
+    """
+    engines = {'object': None, 'array': ArrayEngine, 'event': EventEngine}
+
+    def __init__(self, H, L, time=0, engine='object', seed=None, v_star=2, trip_sink=None,
+                 delta_tL=Edge.delta_tL, delta_tI=Edge.delta_tI):
         super(Graph, self).__init__(time=time)
         self.H = H
         self.L = L
+        self.v_star = v_star
+        self.delta_tL = delta_tL
+        self.delta_tI = delta_tI
+        self.seed = seed
+        self.rng = random if seed is None else random.Random(seed)
         self.construct_inters()
         self.construct_nodes()
         self.construct_edges()
+        # Integer-coded lookup tables of the grid, see TransitionTables.
+        self.tables = TransitionTables(self)
+        # Index in is_outgoing_fringe_nodes of the start node and in is_incoming_fringe_nodes of the end node
+        # of every edge, -1 for intermediate nodes; these are the origin and destination of routes starting or ending on it.
+        self.edge_origin = self.tables.node_origin[self.tables.edge_start]
+        self.edge_destination = self.tables.node_destination[self.tables.edge_end]
+        # Per-edge flow and per-link storage, see set_capacity.
+        self.links = LinkStorage(self.edges)
+        self.route_service = RouteService(self)
+        self.signals = SignalController(self)
+        # Vehicles in flight; finished vehicles are moved to trips.
         self.vehicles = []
+        # Vehicles spawned by the object engine, which numbers them in spawn order like the other engines.
+        self.num_spawned = 0
+        self.trips = TripRecords(sink=trip_sink)
+        # Streaming trip, OD and queue delay statistics, see OnlineStatistics.
+        self.stats = OnlineStatistics.for_graph(self)
         self.t_sim = 30 * 60
+        # One vehicle is spawned every spawn_period ticks, unless a Demand is set with set_demand.
+        self.spawn_period = 1
+        self.demand = None
+        # Print the metrics when t_sim is reached.
+        self.verbose = True
+        # Optional EventRecorder logging vehicle and phase events.
+        self.recorder = None
+        # Optional Instrumentation timing the phases of every tick, see instrument.
+        self.instrumentation = None
+        self.num_discharged = 0
+        if engine not in Graph.engines:
+            raise ValueError(f"Unknown engine '{engine}', expected one of {list(Graph.engines)}.")
+        self.engine_name = engine
+        self.engine = Graph.engines[engine](self) if Graph.engines[engine] is not None else None
+        # (name, phase(time, spawns, screen)) in the order step runs them.
+        if self.engine is not None:
+            self.phases = self.engine.phases
+        else:
+            self.phases = (('intersections', self.step_intersections), ('nodes', self.step_nodes),
+                           ('edges', self.step_edges), ('spawn', self.step_spawn), ('vehicles', self.step_vehicles))
     
     def construct_inters(self):
         H = self.H
@@ -31,6 +104,8 @@ class Graph(Component):
             for j in range(1, L+1):
                 self.interm_inters.append(Intersection(i, j))
         self.inters = self.fringe_inters + self.interm_inters
+        # (i, j) -> Intersection
+        self.inter_index = {(inter.i, inter.j): inter for inter in self.inters}
     
     def construct_nodes(self):
         H = self.H
@@ -52,39 +127,42 @@ class Graph(Component):
         self.interm_nodes = []
         for inter in self.interm_inters:
             for dir in ['E', 'N', 'W', 'S']:
-                self.interm_nodes.append(Node(inter, dir, True, False))
-                self.interm_nodes.append(Node(inter, dir, False, False))
+                self.interm_nodes.append(Node(inter, dir, True, False, v_star=self.v_star))
+                self.interm_nodes.append(Node(inter, dir, False, False, v_star=self.v_star))
         self.is_incoming_fringe_nodes = [node for node in self.fringe_nodes if node.is_incoming]
         self.is_outgoing_fringe_nodes = [node for node in self.fringe_nodes if not node.is_incoming]
         self.nodes = self.fringe_nodes + self.interm_nodes
+        for k, node in enumerate(self.nodes):
+            node.id = k
+        # start_node.id -> incoming fringe nodes at other intersections, the candidate end nodes of sample_trip.
+        self.trip_destinations = {origin.id: [node for node in self.is_incoming_fringe_nodes if node.inter is not origin.inter]
+                                  for origin in self.is_outgoing_fringe_nodes}
+        # Incoming intermediate nodes, which hold the lt/gs queues. Four per intersection, in Intersection.idx_1 order.
+        self.queue_nodes = [node for node in self.interm_nodes if node.is_incoming]
+        self.other_nodes = [node for node in self.nodes if not node.is_incoming or node.is_fringe]
+        # (i, j, dir, is_incoming) -> Node
+        self.node_index = {node.key: node for node in self.nodes}
 
     def construct_edges(self):
-        H = self.H
-        L = self.L
         tup_dir_dict = Component.tup_dir_dict
         op_dir_dict = Component.op_dir_dict
         lt_dir_dict = Component.lt_dir_dict
         rt_dir_dict = Component.rt_dir_dict
+        get_node = self.get_node
+        delta_tL, delta_tI = self.delta_tL, self.delta_tI
         self.edges = []
         for node in self.interm_nodes:
             if node.is_incoming:
-                dir_tuple = tup_dir_dict[node.dir]
-                from_inter = node.inter + dir_tuple
-                i = from_inter.i
-                j = from_inter.j
-                is_fringe = True if i == 0 or i == H+1 or j == 0 or j == L+1 else False
-                from_node_idx = self.nodes.index(Node(from_inter, op_dir_dict[node.dir], False, is_fringe))
-                lt_node_idx = self.nodes.index(Node(node.inter, lt_dir_dict[node.dir], False, False))
-                gs_node_idx = self.nodes.index(Node(node.inter, op_dir_dict[node.dir], False, False))
-                rt_node_idx = self.nodes.index(Node(node.inter, rt_dir_dict[node.dir], False, False))
-                from_node = self.nodes[from_node_idx]
-                tl_node = self.nodes[lt_node_idx]
-                gs_node = self.nodes[gs_node_idx]
-                rt_node = self.nodes[rt_node_idx]
-                from_edge = Edge(from_node, node, False)
-                tl_edge = Edge(node, tl_node, True)
-                gs_edge = Edge(node, gs_node, True)
-                rt_edge = Edge(node, rt_node, True)
+                i, j = node.inter.i, node.inter.j
+                di, dj = tup_dir_dict[node.dir]
+                from_node = get_node(i + di, j + dj, op_dir_dict[node.dir], False)
+                tl_node = get_node(i, j, lt_dir_dict[node.dir], False)
+                gs_node = get_node(i, j, op_dir_dict[node.dir], False)
+                rt_node = get_node(i, j, rt_dir_dict[node.dir], False)
+                from_edge = Edge(from_node, node, False, delta_t=delta_tL)
+                tl_edge = Edge(node, tl_node, True, delta_t=delta_tI)
+                gs_edge = Edge(node, gs_node, True, delta_t=delta_tI)
+                rt_edge = Edge(node, rt_node, True, delta_t=delta_tI)
                 self.edges.append(from_edge)
                 self.edges.append(tl_edge)
                 self.edges.append(gs_edge)
@@ -93,45 +171,429 @@ class Graph(Component):
 
         for node in self.fringe_nodes:
             if node.is_incoming:
-                dir_tuple = tup_dir_dict[node.dir]
-                from_inter = node.inter + dir_tuple
-                from_node_idx = self.nodes.index(Node(from_inter, op_dir_dict[node.dir], False, False))
-                from_node = self.nodes[from_node_idx]
-                from_edge = Edge(from_node, node, False)
+                i, j = node.inter.i, node.inter.j
+                di, dj = tup_dir_dict[node.dir]
+                from_node = get_node(i + di, j + dj, op_dir_dict[node.dir], False)
+                from_edge = Edge(from_node, node, False, delta_t=delta_tL)
                 self.edges.append(from_edge)
                 node.connect_to_edge(from_edge)
+        for k, edge in enumerate(self.edges):
+            edge.id = k
+        # (start_node.key, end_node.key) -> Edge
+        self.edge_index = {(edge.start_node.key, edge.end_node.key): edge for edge in self.edges}
+
+    def get_inter(self, i, j):
+        """
+        Intersection at (i, j), or None if it is not part of the grid.
+        """
+        return self.inter_index.get((i, j))
+
+    def get_node(self, i, j, dir, is_incoming):
+        """
+        Node of the intersection at (i, j) oriented in dir, or None if there is no such node.
+        """
+        return self.node_index.get((i, j, dir, is_incoming))
+
+    def get_edge(self, start_key, end_key):
+        """
+        Edge between the nodes with keys start_key and end_key, or None if they are not connected.
+        :param start_key: (i, j, dir, is_incoming) of the start node
+        :param end_key: (i, j, dir, is_incoming) of the end node
+        """
+        return self.edge_index.get((start_key, end_key))
     
+    def sample_trip(self):
+        """
+        Random (start_node, end_node) pair of fringe nodes at different intersections.
+        """
+        start_node = self.rng.choice(self.is_outgoing_fringe_nodes)
+        end_node = self.rng.choice(self.trip_destinations[start_node.id])
+        return start_node, end_node
+
+    def spawns_at(self, time):
+        """
+        (start_node, end_node) pairs spawned at tick time, drawn from the demand or every spawn_period ticks.
+        """
+        if self.demand is not None:
+            return self.demand.spawns(time)
+        return [self.sample_trip()] if time % self.spawn_period == 0 else []
+
+    def set_capacity(self, capacity):
+        """
+        Limits the number of vehicles stored on every link, so that full links hold back the vehicles
+        leaving upstream intersections (see LinkStorage). Raises ValueError for limited links on the event engine.
+        :param capacity: None for unlimited links, one capacity for every link, or one per edge
+                         (ignored for internal edges, negative for unlimited links).
+        """
+        if self.engine_name == 'event' and capacity is not None and \
+                (np.broadcast_to(capacity, self.links.is_link.shape)[self.links.is_link] >= 0).any():
+            raise ValueError('EventEngine does not support link capacities, use a tick engine.')
+        self.links.set_capacity(capacity)
+        for edge, edge_capacity in zip(self.edges, self.links.capacity.tolist()):
+            edge.capacity = edge_capacity if edge_capacity < LinkStorage.unlimited else None
+
+    def set_demand(self, demand):
+        """
+        Spawns the arrivals of demand (see components.demand) instead of one sample_trip every spawn_period ticks.
+        Routes are then drawn from the demand's generator too. None restores the default.
+        """
+        self.demand = demand
+        self.route_service.rng = None if demand is None else demand.rng
+
+    def metrics(self):
+        """
+        :return: (average cumulative wait time, average travel deviation, number of circulating vehicles)
+        """
+        num_circulating_vehicles = self.engine.num_active if self.engine is not None else len(self.vehicles)
+        return self.trips.mean_cum_wait_time(), self.trips.mean_travel_deviation(), num_circulating_vehicles
+
+    def instrument(self, hooks=()):
+        """
+        Turns on per-phase timers and per-tick counters. Set instrumentation to None to turn them off again.
+        :param hooks: Hook instances called after every tick.
+        :return: the Instrumentation
+        """
+        self.instrumentation = Instrumentation(hooks)
+        return self.instrumentation
+
+    def num_queued(self):
+        """
+        :return: (number of queued vehicles, length of the longest queue)
+        """
+        lengths = self.queue_lengths()
+        return int(lengths.sum()), int(lengths.max(initial=0))
+
+    def queue_lengths(self):
+        """
+        :return: (number of intermediate intersections, 4, 2) array of queue lengths,
+                 indexed like Intersection.traffic_light by Intersection.idx_1 and idx_2
+        """
+        if self.engine is not None:
+            return self.engine.queue_length.reshape(-1, 4, 2)
+        lengths = [(len(node.lt_queue), len(node.gs_queue)) for node in self.queue_nodes]
+        return np.array(lengths, dtype=np.int64).reshape(-1, 4, 2)
+
+    def view(self):
+        """
+        Read-only copy of what is drawn, which stays valid while the graph keeps stepping.
+        :return: dict with time, modes (one per Graph.inters, -1 before the first tick), and for every
+                 vehicle in flight its id, location (ids, (k, 2) array locs) and heading in degrees (theta)
+        """
+        modes = self.signals.modes.astype(np.int8)
+        if self.engine is not None:
+            slots, locs, edges = self.engine.locations()
+            return {'time': self.time, 'modes': modes, 'ids': self.engine.seq[slots],
+                    'locs': locs, 'theta': self.engine.theta[edges]}
+        vehicles = self.vehicles
+        tables = self.tables
+        edges = np.array([vehicle.route_edges[vehicle.hop].id for vehicle in vehicles], dtype=np.intp)
+        # Queued vehicles wait at the start of the edge they are queued for.
+        timers = np.array([0 if vehicle.timer is None else vehicle.timer for vehicle in vehicles], dtype=float)
+        progress = (timers / tables.edge_delta_t[edges])[:, None]
+        locs = (1 - progress) * tables.edge_start_xy[edges] + progress * tables.edge_end_xy[edges]
+        ids = np.array([vehicle.id for vehicle in vehicles], dtype=np.int64)
+        return {'time': self.time, 'modes': modes, 'ids': ids, 'locs': locs, 'theta': tables.edge_theta[edges]}
+
+    def record_phases(self, time):
+        """
+        Logs the phase changes of the intermediate intersections to the recorder.
+        """
+        self.recorder.record_phases(time, self.signals.interm_modes, offset=len(self.fringe_inters))
+
+    def snapshot(self):
+        """
+        Copy of the full simulation state: time, signal modes and policy, demand, queues, vehicles, trips and random state.
+        Raises ValueError if the signal policy or the demand is not one of components.signals or components.demand.
+        :return: (JSON-serializable dict, dict of name -> NumPy array), see from_snapshot and save
+        """
+        rng_state = self.rng.getstate()
+        meta = {
+            'H': self.H, 'L': self.L, 'engine': self.engine_name, 'seed': self.seed, 'v_star': self.v_star,
+            'delta_tL': self.delta_tL, 'delta_tI': self.delta_tI, 'time': self.time,
+            't_sim': self.t_sim, 'spawn_period': self.spawn_period, 'verbose': self.verbose,
+            'rng_state': [rng_state[0], list(rng_state[1]), rng_state[2]],
+            'trips': {'count': self.trips.count, 'sum_cum_wait_time': self.trips.sum_cum_wait_time,
+                      'sum_travel_deviation': self.trips.sum_travel_deviation},
+        }
+        meta['stats'], stats_arrays = self.stats.get_state()
+        meta['signals'], signals_arrays = self.signals.get_state()
+        arrays = {}
+        for name in TripRecords.columns:
+            arrays['trips/' + name] = self.trips.column(name)
+        for name, array in stats_arrays.items():
+            arrays['stats/' + name] = array
+        for name, array in signals_arrays.items():
+            arrays['signals/' + name] = array
+        meta['demand'] = None
+        if self.demand is not None:
+            kind = getattr(self.demand, 'name', None)
+            if demands.get(kind) is not type(self.demand):
+                raise ValueError(f"Cannot save the state of demand {type(self.demand).__name__}, "
+                                 f"expected one of {[cls.__name__ for cls in demands.values()]}.")
+            demand_meta, demand_arrays = self.demand.get_state()
+            meta['demand'] = dict(demand_meta, kind=kind)
+            for name, array in demand_arrays.items():
+                arrays['demand/' + name] = array
+        for name, array in self.links.get_state().items():
+            arrays['links/' + name] = array
+        if self.engine is not None:
+            engine_meta, engine_arrays = self.engine.get_state()
+        else:
+            engine_meta, engine_arrays = self.get_vehicle_state()
+        meta['engine_state'] = engine_meta
+        for name, array in engine_arrays.items():
+            arrays['engine/' + name] = array
+        return meta, arrays
+
+    @classmethod
+    def from_snapshot(cls, meta, arrays, seed=None, trip_sink=None):
+        """
+        New graph in the state recorded by snapshot.
+        :param seed: if given, the restored graph draws from random.Random(seed) (and its demand from a
+                     generator seeded with seed) instead of continuing the saved random streams,
+                     e.g. to get independent branches.
+                     A snapshot of a graph using the global random module resets that module's state.
+        :param trip_sink: trip_sink of the restored graph, see Graph. Snapshots only hold the trips kept in memory.
+        """
+        graph = cls(meta['H'], meta['L'], time=meta['time'], engine=meta['engine'], seed=meta['seed'],
+                    v_star=meta['v_star'], trip_sink=trip_sink, delta_tL=meta['delta_tL'], delta_tI=meta['delta_tI'])
+        graph.t_sim = meta['t_sim']
+        graph.spawn_period = meta['spawn_period']
+        graph.verbose = meta['verbose']
+        version, state, gauss_next = meta['rng_state']
+        graph.rng.setstate((version, tuple(state), gauss_next))
+        if seed is not None:
+            graph.seed = seed
+            graph.rng = random.Random(seed)
+        graph.signals.set_state(meta['signals'], {name[len('signals/'):]: array for name, array in arrays.items()
+                                                  if name.startswith('signals/')})
+        graph.signals.update_inters(graph.time)
+        capacity = arrays['links/capacity']
+        graph.set_capacity(np.where(capacity < LinkStorage.unlimited, capacity, -1))
+        graph.links.set_state({name: arrays['links/' + name] for name in ('capacity', 'occupancy', 'flow')})
+        graph.trips.extend(*(arrays['trips/' + name] for name in TripRecords.columns))
+        for name, value in meta['trips'].items():
+            setattr(graph.trips, name, value)
+        graph.stats.set_state(meta['stats'], {name[len('stats/'):]: array for name, array in arrays.items()
+                                              if name.startswith('stats/')})
+        if meta['demand'] is not None:
+            demand = demands[meta['demand']['kind']].from_state(graph, meta['demand'], {
+                name[len('demand/'):]: array for name, array in arrays.items() if name.startswith('demand/')})
+            if seed is not None:
+                demand.rng = np.random.default_rng(seed)
+            graph.set_demand(demand)
+        engine_arrays = {name[len('engine/'):]: array for name, array in arrays.items() if name.startswith('engine/')}
+        if graph.engine is not None:
+            graph.engine.set_state(meta['engine_state'], engine_arrays)
+        else:
+            graph.set_vehicle_state(meta['engine_state'], engine_arrays)
+        return graph
+
+    def save(self, path):
+        """
+        Writes snapshot() to path, see components.snapshot for the format.
+        """
+        save_snapshot(path, *self.snapshot())
+
+    @classmethod
+    def load(cls, path, seed=None, mmap=True, trip_sink=None):
+        """
+        Restores a graph saved with save. See from_snapshot for seed and trip_sink.
+        """
+        return cls.from_snapshot(*load_snapshot(path, mmap=mmap), seed=seed, trip_sink=trip_sink)
+
+    def fork(self, seed=None):
+        """
+        Independent copy of the graph in its current state, sending its trips to the same trip_sink.
+        """
+        return type(self).from_snapshot(*self.snapshot(), seed=seed, trip_sink=self.trips.sink)
+
+    def get_vehicle_state(self):
+        """
+        State of the Vehicle objects and node queues of the object engine.
+        Nodes and edges are given by their index in nodes and edges, vehicles in queues by their index in vehicles.
+        """
+        vehicles = self.vehicles
+        position = {id(vehicle): k for k, vehicle in enumerate(vehicles)}
+        arrays = {
+            'id': np.array([vehicle.id for vehicle in vehicles], dtype=np.int64),
+            'time': np.array([vehicle.time for vehicle in vehicles], dtype=np.int64),
+            'start_node': np.array([vehicle.start_node.id for vehicle in vehicles], dtype=np.int32),
+            'end_node': np.array([vehicle.end_node.id for vehicle in vehicles], dtype=np.int32),
+            'hop': np.array([vehicle.hop for vehicle in vehicles], dtype=np.int16),
+            'timer': np.array([-1 if vehicle.timer is None else vehicle.timer for vehicle in vehicles], dtype=np.int32),
+            'start_time': np.array([vehicle.start_time for vehicle in vehicles], dtype=np.int64),
+            'cum_wait_time': np.array([vehicle.cum_wait_time for vehicle in vehicles], dtype=np.int64),
+            'min_travel_time': np.array([vehicle.min_travel_time for vehicle in vehicles], dtype=np.int64),
+            'route_len': np.array([len(vehicle.route_edges) for vehicle in vehicles], dtype=np.int16),
+            'routes': np.array([edge.id for vehicle in vehicles for edge in vehicle.route_edges], dtype=np.int32),
+        }
+        queues = [queue for node in self.interm_nodes if node.is_incoming for queue in (node.lt_queue, node.gs_queue)]
+        arrays['queue_length'] = np.array([len(queue) for queue in queues], dtype=np.int32)
+        # Queues are stored left to right, i.e. most recently joined first.
+        arrays['queue_vehicles'] = np.array([position[id(vehicle)] for queue in queues for vehicle in queue], dtype=np.int64)
+        return {'num_spawned': self.num_spawned}, arrays
+
+    def set_vehicle_state(self, meta, arrays):
+        self.num_spawned = meta['num_spawned']
+        routes = arrays['routes'].tolist()
+        ends = np.cumsum(arrays['route_len']).tolist()
+        self.vehicles = []
+        for k, end in enumerate(ends):
+            route_edges = [self.edges[e] for e in routes[end - int(arrays['route_len'][k]):end]]
+            vehicle = Vehicle(int(arrays['id'][k]), self.nodes[arrays['start_node'][k]], self.nodes[arrays['end_node'][k]],
+                              time=int(arrays['time'][k]), graph=self, route_edges=route_edges)
+            vehicle.start_time = int(arrays['start_time'][k])
+            vehicle.cum_wait_time = int(arrays['cum_wait_time'][k])
+            vehicle.min_travel_time = int(arrays['min_travel_time'][k])
+            vehicle.hop = int(arrays['hop'][k])
+            timer = int(arrays['timer'][k])
+            if timer < 0:
+                vehicle.timer = None
+                vehicle.current = route_edges[vehicle.hop].start_node
+                vehicle.loc = vehicle.current.loc
+            else:
+                vehicle.timer = timer
+                vehicle.current = route_edges[vehicle.hop]
+            self.vehicles.append(vehicle)
+        queues = [queue for node in self.interm_nodes if node.is_incoming for queue in (node.lt_queue, node.gs_queue)]
+        queue_vehicles = arrays['queue_vehicles'].tolist()
+        ends = np.cumsum(arrays['queue_length']).tolist()
+        for queue, end, length in zip(queues, ends, arrays['queue_length'].tolist()):
+            queue.extend(self.vehicles[v] for v in queue_vehicles[end - length:end])
+
+    def next_spawn_time(self):
+        """
+        First tick at or after self.time at which a vehicle is spawned, None if there is none before t_sim.
+        """
+        if self.demand is not None:
+            return self.demand.next_time(self.time, self.t_sim)
+        return -(-self.time // self.spawn_period) * self.spawn_period
+
+    def step_intersections(self, time, spawns, screen):
+        self.signals.step(time, screen=screen)
+        if self.recorder is not None:
+            self.record_phases(time)
+
+    def step_nodes(self, time, spawns, screen):
+        recorder = self.recorder
+        links = self.links
+        links.refresh()
+        discharged = 0
+        for node, green in zip(self.queue_nodes, self.signals.green.tolist()):
+            discharged += node.step(screen=screen, recorder=recorder, green=green, links=links)
+        for node in self.other_nodes:
+            node.step(screen=screen)
+        self.num_discharged += discharged
+
+    def step_edges(self, time, spawns, screen):
+        for edge in self.edges:
+            edge.step(screen=screen)
+
+    def step_spawn(self, time, spawns, screen):
+        recorder = self.recorder
+        for start_node, end_node in spawns:
+            vehicle = Vehicle(self.num_spawned, start_node, end_node, time=time, graph=self)
+            self.num_spawned += 1
+            vehicle.timer = 0
+            self.vehicles.append(vehicle)
+            self.links.enter(vehicle.route_edges[0].id)
+            if recorder is not None:
+                recorder.record(time, recorder.ENTER, vehicle.id, vehicle.current.id)
+
+    def step_vehicles(self, time, spawns, screen):
+        stats = self.stats
+        # Every vehicle still queued after the node phase waits during this vehicle phase.
+        stats.add_waits(self.queue_lengths())
+        self.links.refresh()
+        vehicles = []
+        for vehicle in self.vehicles:
+            vehicle.step(screen=screen)
+            if vehicle.is_finished:
+                self.trips.append(vehicle.id, vehicle.start_time, vehicle.finish_time,
+                                  vehicle.min_travel_time, vehicle.cum_wait_time)
+                route_edges = vehicle.route_edges
+                stats.add_trip(self.edge_origin[route_edges[0].id], self.edge_destination[route_edges[-1].id],
+                               vehicle.start_time, vehicle.finish_time, vehicle.min_travel_time, vehicle.cum_wait_time)
+            else:
+                vehicles.append(vehicle)
+        self.vehicles = vehicles
+
+    def advance(self, actions=None, n_ticks=1):
+        """
+        Holds the modes in actions for n_ticks ticks, or until t_sim, e.g. for a controller deciding every few seconds.
+        The first call replaces the signal policy with an ExternalPolicy. Needs a tick engine (object or array).
+        The ticks run the engine's phases directly, as step does without a screen, instrumentation or metrics report.
+        :param actions: one mode (row of Intersection.traffic_light) per intermediate intersection,
+                        None to keep the current ones.
+        :return: (observation, rewards, done) where observation is a dict of
+                     time          : tick after the window
+                     modes         : (N,) modes of the intermediate intersections
+                     queue_lengths : (N, 4, 2) queue lengths after the window, as queue_lengths()
+                     waiting       : (N,) vehicles queued at every intersection after the window
+                     wait_ticks    : (N, 4, 2) vehicle-ticks spent in every queue during the window
+                     num_finished  : trips finished during the window
+                 rewards is minus the vehicle-ticks waited at every intersection during the window
+                 and done is True once t_sim is reached.
+        """
+        if self.engine_name == 'event':
+            raise ValueError('advance needs a tick engine, the event engine only supports the default signal plan.')
+        policy = self.signals.policy
+        if not isinstance(policy, ExternalPolicy):
+            policy = self.signals.policy = ExternalPolicy(self)
+        if actions is not None:
+            policy.set_actions(actions)
+        queue_delay = self.stats.queue_delay.copy()
+        num_trips = len(self.trips)
+        end = min(self.time + n_ticks, self.t_sim)
+        if self.instrumentation is not None:
+            while self.time < end:
+                self.step()
+        else:
+            phases = [phase for _, phase in self.phases]
+            spawns_at = self.spawns_at
+            for time in range(self.time, end):
+                spawns = spawns_at(time)
+                for phase in phases:
+                    phase(time, spawns, None)
+                self.time = time + 1
+        queue_lengths = self.queue_lengths().copy()
+        wait_ticks = (self.stats.queue_delay - queue_delay).reshape(queue_lengths.shape)
+        observation = {'time': self.time, 'modes': self.signals.interm_modes.copy(), 'queue_lengths': queue_lengths,
+                       'waiting': queue_lengths.sum(axis=(1, 2)), 'wait_ticks': wait_ticks,
+                       'num_finished': len(self.trips) - num_trips}
+        return observation, -wait_ticks.sum(axis=(1, 2)), self.time >= self.t_sim
+
+    def run(self, until=None):
+        """
+        Steps the graph headless until time exceeds until (defaults to t_sim, where the metrics are reported).
+        Engines that can tell when their next event is (EventEngine) skip the idle ticks in between.
+        """
+        until = self.t_sim if until is None else until
+        next_time = getattr(self.engine, 'next_time', None)
+        while self.time <= until:
+            if next_time is not None and self.time < self.t_sim:
+                candidates = [t for t in (next_time(), self.next_spawn_time()) if t is not None]
+                self.time = min(candidates + [self.t_sim, until])
+                if self.time > until:
+                    break
+            self.step()
+
     def step(self, screen=None):
         if self.time == self.t_sim:
-            wait_times = np.array([vehicle.cum_wait_time for vehicle in self.vehicles if vehicle.is_finished])
-            self.avg_cum_wait_time = np.mean(wait_times)
-            print(self.avg_cum_wait_time)
-            travel_deviations = np.array([vehicle.travel_time - vehicle.min_travel_time for vehicle in self.vehicles if vehicle.is_finished])
-            self.avg_travel_deviation = np.mean(travel_deviations)
-            print(self.avg_travel_deviation)
-            cnt = 0
-            for vehicle in self.vehicles:
-                if not vehicle.is_finished:
-                    cnt += 1
-            self.num_circulating_vehicles = cnt
-            print(self.num_circulating_vehicles)
+            self.avg_cum_wait_time, self.avg_travel_deviation, self.num_circulating_vehicles = self.metrics()
+            if self.verbose:
+                print(self.avg_cum_wait_time)
+                print(self.avg_travel_deviation)
+                print(self.num_circulating_vehicles)
         elif self.time < self.t_sim:
-            for inter in self.inters:
-                inter.step(None, screen=screen)
-            for node in self.nodes:
-                node.step(screen=screen)
-            for edge in self.edges:
-                edge.step(screen=screen)
-            if self.time % 1 == 0:
-                start_node = random.choice(self.is_outgoing_fringe_nodes)
-                end_node = random.choice([node for node in self.is_incoming_fringe_nodes if node.inter is not start_node.inter])
-                vehicle = Vehicle(self.time, start_node, end_node, time=self.time)
-                vehicle.timer = 0
-                self.vehicles.append(vehicle)
-            for vehicle in self.vehicles:
-                vehicle.step(screen=screen)
+            spawns = self.spawns_at(self.time)
+            if self.instrumentation is not None:
+                self.instrumentation.step(self, spawns, screen)
+            else:
+                for _, phase in self.phases:
+                    phase(self.time, spawns, screen)
         # end_node = random.choice(self.fringe_nodes)
         # while start_node is end_node:
         #     end_node = random.choice(self.fringe_nodes)
         self.time += 1
-        
\ No newline at end of file
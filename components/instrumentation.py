@@ -0,0 +1,156 @@
+import json
+import time
+
+__all__ = ['Instrumentation', 'Hook', 'ProfilerHook', 'HTTPExporter']
+
+
+class Instrumentation:
+    """
+    Per-phase timers and per-tick counters of a Graph, turned on with Graph.instrument.
+    Graph.step only checks graph.instrumentation against None when it is off.
+    Every tick produces a stats dict passed to the hooks:
+        time       : tick
+        active     : vehicles in flight after the tick
+        queued     : vehicles waiting in lt/gs queues after the tick
+        max_queue  : length of the longest queue
+        spawns     : vehicles spawned during the tick
+        discharges : vehicles released from queues during the tick
+        phase_ns   : dict of phase name (see Graph.phases) -> nanoseconds spent in it
+    """
+    def __init__(self, hooks=()):
+        self.hooks = list(hooks)
+        self.num_ticks = 0
+        self.phase_ns = {}
+        self.num_spawns = 0
+        self.num_discharges = 0
+        self.last = None
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def step(self, graph, spawns, screen):
+        """
+        Runs the phases of one tick of graph, timing each of them.
+        """
+        tick = graph.time
+        counter = graph.engine if graph.engine is not None else graph
+        num_discharged = counter.num_discharged
+        clock = time.perf_counter_ns
+        phase_ns = {}
+        for name, phase in graph.phases:
+            start = clock()
+            phase(tick, spawns, screen)
+            phase_ns[name] = clock() - start
+        queued, max_queue = graph.num_queued()
+        stats = {
+            'time': tick,
+            'active': graph.engine.num_active if graph.engine is not None else len(graph.vehicles),
+            'queued': queued,
+            'max_queue': max_queue,
+            'spawns': len(spawns),
+            'discharges': counter.num_discharged - num_discharged,
+            'phase_ns': phase_ns,
+        }
+        self.num_ticks += 1
+        self.num_spawns += stats['spawns']
+        self.num_discharges += stats['discharges']
+        for name, ns in phase_ns.items():
+            self.phase_ns[name] = self.phase_ns.get(name, 0) + ns
+        self.last = stats
+        for hook in self.hooks:
+            hook.on_tick(graph, stats)
+
+    def summary(self):
+        """
+        Totals over every instrumented tick, with the seconds spent in each phase.
+        """
+        return {
+            'ticks': self.num_ticks,
+            'spawns': self.num_spawns,
+            'discharges': self.num_discharges,
+            'phase_seconds': {name: ns / 1e9 for name, ns in self.phase_ns.items()},
+        }
+
+    def close(self):
+        for hook in self.hooks:
+            hook.close()
+
+
+class Hook:
+    """
+    Base class of instrumentation hooks. on_tick is called after every tick with the tick's stats,
+    close when the instrumented run is over (Instrumentation.close).
+    """
+    def on_tick(self, graph, stats):
+        pass
+
+    def close(self):
+        pass
+
+
+class ProfilerHook(Hook):
+    """
+    Profiles ticks start..stop-1 with cProfile and writes the stats (pstats format) to path.
+    """
+    def __init__(self, path, start=0, stop=None):
+        self.path = path
+        self.start = start
+        self.stop = stop
+        import cProfile
+        self.profile = cProfile.Profile()
+        self.is_enabled = False
+        if start == 0:
+            self.enable()
+
+    def enable(self):
+        self.profile.enable()
+        self.is_enabled = True
+
+    def disable(self):
+        if self.is_enabled:
+            self.profile.disable()
+            self.is_enabled = False
+            self.profile.dump_stats(self.path)
+
+    def on_tick(self, graph, stats):
+        # Hooks run after a tick, so the window is opened and closed before the next one.
+        if stats['time'] + 1 == self.start:
+            self.enable()
+        elif stats['time'] + 1 == self.stop:
+            self.disable()
+
+    def close(self):
+        self.disable()
+
+
+class HTTPExporter(Hook):
+    """
+    POSTs the stats of every `every` ticks as a JSON list to url, e.g. a local metrics collector.
+    Failed requests are counted in errors instead of interrupting the simulation.
+    """
+    def __init__(self, url, every=100, timeout=1.0):
+        self.url = url
+        self.every = every
+        self.timeout = timeout
+        self.batch = []
+        self.errors = 0
+
+    def on_tick(self, graph, stats):
+        self.batch.append(stats)
+        if len(self.batch) >= self.every:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        import urllib.request
+        request = urllib.request.Request(self.url, data=json.dumps(self.batch).encode(),
+                                         headers={'Content-Type': 'application/json'}, method='POST')
+        self.batch = []
+        try:
+            urllib.request.urlopen(request, timeout=self.timeout).close()
+        except OSError:
+            self.errors += 1
+
+    def close(self):
+        self.flush()
@@ -1,7 +1,6 @@
-import pygame
 import numpy as np
 from components.component import Component
-from components.methods.methods import center_blit, center_rect, to_vector2
+from components.methods.methods import center_blit, load_font, to_location
 
 class Intersection(Component):
     """
@@ -38,8 +37,8 @@ class Intersection(Component):
         self.i = i
         self.j = j
         self.mode = None
-        # loc is a pygame.math.Vector2 object, with loc.x=c*j and loc.y=c*i for some c.
-        self.loc = to_vector2((i, j))
+        # loc is a Location, with loc.x=c*j and loc.y=c*i for some c.
+        self.loc = to_location((i, j))
         self.set_image('images/intersection.png')
         self.set_text('fonts/NanumGothic.ttf')
 
@@ -59,27 +58,31 @@ class Intersection(Component):
     def __str__(self):
         return f"Intersection at: i={self.i}, j={self.j}"
 
-    def set_image(self, path=None):
+    def set_text(self, path=None):
         """
-        Sets display image and location.
+        Sets the font path for the mode label. The font is created lazily by load_text.
         """
-        if path is not None:
-            self.image = pygame.image.load(path)
-            self.display_image = self.image
-            self.width = self.image.get_width()
-            self.height = self.image.get_height()
-        self.rect = center_rect(self)
-        self.mask = pygame.mask.from_surface(self.display_image)
-    
-    def set_text(self, path=None):
-        self.font = pygame.font.Font(path, 10)
+        self.font_path = path
+        self.font = None
+        self.display_text = None
+        self.display_mode = None
         self.color = (255, 255, 255)
-        self.display_text = self.font.render(f'{self.mode}', True, self.color)
+
+    def load_text(self):
+        self.font = load_font(self.font_path, 10)
+        self.update_text()
     
     def update_text(self):
-        self.display_text = self.font.render(f'{self.mode}', True, self.color)
+        # Re-render the label only when the mode actually changed.
+        if self.display_text is None or self.display_mode != self.mode:
+            self.display_text = self.font.render(f'{self.mode}', True, self.color)
+            self.display_mode = self.mode
         
     def blit(self, screen):
+        if self.image is None:
+            self.load_image()
+        if self.font is None:
+            self.load_text()
         self.update_text()
         center_blit(self.display_image, self.loc, screen)
         center_blit(self.display_text, self.loc, screen)
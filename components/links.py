@@ -0,0 +1,130 @@
+import numpy as np
+from components.edge import Edge
+
+__all__ = ['LinkStorage']
+
+
+class LinkStorage:
+    """
+    Per-edge flow and per-link storage of a grid, updated as vehicles move instead of by counting them.
+        flow      : number of vehicles that entered every edge
+        occupancy : number of vehicles stored on every link (Edge.LINK): driving on it, waiting at its end,
+                    or on an internal edge leading into it, which they can always leave for the link
+        capacity  : maximum occupancy of every link, unlimited by default
+    With limited capacities, a vehicle only leaves the end of a link (queue discharge or right turn) if the next
+    link has space, so full links block their upstream intersections and queues spill back. Space is taken
+    from the occupancy at the start of every node and vehicle phase (refresh), as in the cell transmission model:
+    a vehicle leaving a link only frees its space for the next phase, whatever order vehicles are processed in.
+    Vehicles entering from the fringe are never held back.
+    Internal edges have no capacity of their own; link is the link whose occupancy every edge counts towards.
+    """
+    unlimited = np.iinfo(np.int64).max
+
+    def __init__(self, edges):
+        num_edges = len(edges)
+        self.link = np.array([edge.id if edge.kind == Edge.LINK else edge.end_node.to_edge.id for edge in edges],
+                             dtype=np.intp)
+        self.is_link = np.array([edge.kind == Edge.LINK for edge in edges], dtype=bool)
+        self.capacity = np.full(num_edges, LinkStorage.unlimited, dtype=np.int64)
+        self.occupancy = np.zeros(num_edges, dtype=np.int64)
+        self.flow = np.zeros(num_edges, dtype=np.int64)
+        self.space = self.capacity - self.occupancy
+        self.is_limited = False
+
+    def set_capacity(self, capacity):
+        """
+        :param capacity: None for unlimited links, the capacity of every link, or one capacity per edge
+                         (ignored for internal edges, negative for unlimited links).
+        """
+        capacity = np.broadcast_to(-1 if capacity is None else np.asarray(capacity), self.capacity.shape)
+        self.capacity[:] = np.where(self.is_link & (capacity >= 0), capacity, LinkStorage.unlimited)
+        self.is_limited = bool((self.capacity < LinkStorage.unlimited).any())
+        self.refresh()
+
+    def tile(self, num_copies):
+        """
+        Storage of num_copies independent copies of the grid, with the edges of copy k offset by k * num_edges.
+        """
+        num_edges = len(self.link)
+        copy = LinkStorage.__new__(LinkStorage)
+        copy.link = (np.arange(num_copies)[:, None] * num_edges + self.link).ravel()
+        for name in ('is_link', 'capacity', 'occupancy', 'flow'):
+            setattr(copy, name, np.tile(getattr(self, name), num_copies))
+        copy.is_limited = self.is_limited
+        copy.refresh()
+        return copy
+
+    def refresh(self):
+        """
+        Takes the space left on every link at the start of a phase.
+        """
+        self.space = self.capacity - self.occupancy
+
+    def admit(self, edge):
+        """
+        Takes one unit of the space of the link of edge if there is any left in this phase.
+        :return: True if a vehicle may enter edge
+        """
+        link = self.link[edge]
+        if self.space[link] > 0:
+            self.space[link] -= 1
+            return True
+        return False
+
+    def admit_all(self, edges):
+        """
+        Batch version of admit for edges requested in order: requests for the same link are served first come first served.
+        :return: bool array, True for the admitted requests
+        """
+        links = self.link[edges]
+        order = np.argsort(links, kind='stable')
+        sorted_links = links[order]
+        rank = np.arange(len(links)) - np.searchsorted(sorted_links, sorted_links)
+        admitted = np.empty(len(links), dtype=bool)
+        admitted[order] = rank < self.space[sorted_links]
+        np.subtract.at(self.space, links[admitted], 1)
+        return admitted
+
+    def enter(self, edge, flow=True):
+        """
+        A vehicle enters the grid on edge (flow=False for vehicles that are only moved, e.g. between tiles).
+        """
+        if flow:
+            self.flow[edge] += 1
+        self.occupancy[self.link[edge]] += 1
+
+    def move(self, from_edge, to_edge):
+        """
+        A vehicle leaves the end of from_edge for to_edge.
+        """
+        self.flow[to_edge] += 1
+        self.occupancy[self.link[from_edge]] -= 1
+        self.occupancy[self.link[to_edge]] += 1
+
+    def leave(self, edge):
+        """
+        A vehicle leaves the grid (or the tile) from edge.
+        """
+        self.occupancy[self.link[edge]] -= 1
+
+    def enter_all(self, edges, flow=True):
+        if flow:
+            np.add.at(self.flow, edges, 1)
+        np.add.at(self.occupancy, self.link[edges], 1)
+
+    def move_all(self, from_edges, to_edges):
+        np.add.at(self.flow, to_edges, 1)
+        np.subtract.at(self.occupancy, self.link[from_edges], 1)
+        np.add.at(self.occupancy, self.link[to_edges], 1)
+
+    def leave_all(self, edges):
+        np.subtract.at(self.occupancy, self.link[edges], 1)
+
+    def get_state(self):
+        return {'capacity': self.capacity.copy(), 'occupancy': self.occupancy.copy(), 'flow': self.flow.copy()}
+
+    def set_state(self, arrays):
+        for name in ('capacity', 'occupancy', 'flow'):
+            getattr(self, name)[:] = arrays[name]
+        self.is_limited = bool((self.capacity < LinkStorage.unlimited).any())
+        self.refresh()
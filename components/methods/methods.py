@@ -1,6 +1,21 @@
-from pygame.math import Vector2
+from collections import namedtuple
 
-__all__ = ['center_blit', 'center_rect', 'to_vector2']
+__all__ = ['Location', 'center_blit', 'center_rect', 'to_location', 'to_vector2', 'interpolate',
+           'load_image', 'load_mask', 'load_font', 'rotate_image']
+
+# Screen location of a component. A plain tuple, so the simulation never needs pygame:
+# pygame is only imported by the functions below that load or draw assets.
+Location = namedtuple('Location', ('x', 'y'))
+
+# Process-wide asset caches shared by every component.
+# _image_cache : path -> Surface
+# _mask_cache : path -> Mask
+# _font_cache : (path, size) -> Font
+# _rotation_cache : (path, quantized heading) -> Surface
+_image_cache = {}
+_mask_cache = {}
+_font_cache = {}
+_rotation_cache = {}
 
 
 def center_blit(surface, loc, screen):
@@ -18,10 +33,83 @@ def center_rect(sprite):
                                                 sprite.loc.y - sprite.height/2)
 
 
+def to_location(tuple):
+    return Location(240 * tuple[1], 240 * tuple[0])
+
+
 def to_vector2(tuple):
+    from pygame.math import Vector2
     return Vector2(240 * tuple[1], 240 * tuple[0])
 
 
+def interpolate(start, end, progress):
+    """
+    Location at progress (0 to 1) on the segment from start to end.
+    """
+    return Location((1 - progress) * start[0] + progress * end[0], (1 - progress) * start[1] + progress * end[1])
+
+
+def load_image(path):
+    """
+    Load an image once per process and share the Surface between all components using it.
+    :param path: path of the image file
+    :return: pygame.Surface
+    """
+    image = _image_cache.get(path)
+    if image is None:
+        import pygame
+        image = pygame.image.load(path)
+        _image_cache[path] = image
+    return image
+
+
+def load_mask(path):
+    """
+    Mask of the (unrotated) image at path, computed once per process.
+    """
+    mask = _mask_cache.get(path)
+    if mask is None:
+        import pygame
+        mask = pygame.mask.from_surface(load_image(path))
+        _mask_cache[path] = mask
+    return mask
+
+
+def load_font(path, size):
+    """
+    Font shared by every component drawing text of this size.
+    Falls back to pygame's default font when path does not exist.
+    """
+    key = (path, size)
+    font = _font_cache.get(key)
+    if font is None:
+        import pygame
+        try:
+            font = pygame.font.Font(path, size)
+        except FileNotFoundError:
+            font = pygame.font.Font(None, size)
+        _font_cache[key] = font
+    return font
+
+
+def rotate_image(path, angle, resolution=1):
+    """
+    Rotated copy of the image at path, cached by angle quantized to resolution degrees.
+    Vehicles only travel along a handful of edge headings, so the cache stays small.
+    :param path: path of the image file
+    :param angle: counterclockwise rotation in degrees, as in pygame.transform.rotate
+    :param resolution: quantization step in degrees
+    :return: pygame.Surface
+    """
+    key = (path, int(round(angle / resolution)) * resolution % 360)
+    image = _rotation_cache.get(key)
+    if image is None:
+        import pygame
+        image = pygame.transform.rotate(load_image(path), key[1])
+        _rotation_cache[key] = image
+    return image
+
+
 def bind_vehicle_to_road(vehicle, road):
     vehicle.road = road
     road.vehicles.push(vehicle)
\ No newline at end of file
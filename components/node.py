@@ -1,9 +1,8 @@
-import pygame
-from pygame.math import Vector2
 from collections import deque
 from components.component import Component
+from components.edge import Edge
 from components.intersection import Intersection
-from components.methods.methods import center_blit, center_rect, to_vector2
+from components.methods.methods import Location
 
 
 class Node(Component):
@@ -11,12 +10,26 @@ class Node(Component):
     Node at a given intersection oriented in some direction,
     with bool values for is_incoming and is_fringe.
     """
+    # (x, y) offset of a node from the center of its intersection by direction code and is_incoming:
+    # 0.20 block towards dir, then 0.08 block to the right of incoming and to the left of outgoing nodes.
+    offsets = tuple(tuple((240 * (0.20 * dj + 0.08 * sj), 240 * (0.20 * di + 0.08 * si))
+                          for si, sj in (Component.tup_dir_codes[Component.lt_dir_codes[code]],
+                                         Component.tup_dir_codes[Component.rt_dir_codes[code]]))
+                    for code, (di, dj) in enumerate(Component.tup_dir_codes))
+    __slots__ = ('id', 'inter', 'dir', 'dir_code', 'is_incoming', 'is_fringe', 'key', 'lt_queue', 'gs_queue', 'lt_signal', 'rt_signal',
+                 'v_star', 'color', 'loc', 'from_edge', 'to_edge', 'lt_edge', 'gs_edge', 'rt_edge')
+
     def __init__(self, inter, dir, is_incoming, is_fringe, v_star=2, time=0):
         super(Node, self).__init__(time=time)
+        # Position in Graph.nodes, set by the graph.
+        self.id = None
         self.inter = inter
         self.dir = dir
+        self.dir_code = Component.dir_codes[dir]
         self.is_incoming = is_incoming
         self.is_fringe = is_fringe
+        # Coordinate key used by Graph.node_index.
+        self.key = (inter.i, inter.j, dir, is_incoming)
         if is_incoming and not is_fringe:
             self.lt_queue = deque()
             self.gs_queue = deque()
@@ -39,20 +52,11 @@ class Node(Component):
 is_incoming={self.is_incoming}, is_fringe={self.is_fringe}"
 
     def set_color(self):
-        color_value = (255, 0, 0) if self.is_incoming else (0, 0, 255)
-        self.color = pygame.color.Color(*color_value)
+        self.color = (255, 0, 0) if self.is_incoming else (0, 0, 255)
     
     def set_location(self):
-        node_loc = Vector2(self.inter.loc)
-        tup_dir_dict = Component.tup_dir_dict
-        lt_dir_dict = Component.lt_dir_dict
-        rt_dir_dict = Component.rt_dir_dict
-        node_loc += 0.20 * to_vector2(tup_dir_dict[self.dir])
-        if self.is_incoming:
-            node_loc += 0.08 * to_vector2(tup_dir_dict[rt_dir_dict[self.dir]])
-        else:
-            node_loc += 0.08 * to_vector2(tup_dir_dict[lt_dir_dict[self.dir]])
-        self.loc = node_loc
+        dx, dy = Node.offsets[self.dir_code][self.is_incoming]
+        self.loc = Location(self.inter.loc.x + dx, self.inter.loc.y + dy)
     
     def connect_to_edge(self, from_edge=None, lt_edge=None, gs_edge=None, rt_edge=None):
         if from_edge is not None:
@@ -63,33 +67,58 @@ is_incoming={self.is_incoming}, is_fringe={self.is_fringe}"
             if lt_edge is not None:
                 assert self is lt_edge.start_node, "lt_edge's start_node should be oneself."
                 self.lt_edge = lt_edge
+                lt_edge.kind = Edge.LT
                 lt_edge.end_node.lt_edge = lt_edge
             if gs_edge is not None:
                 assert self is gs_edge.start_node, "gs_edge's start_node should be oneself."
                 self.gs_edge = gs_edge
+                gs_edge.kind = Edge.GS
                 gs_edge.end_node.gs_edge = gs_edge
             if rt_edge is not None:
                 assert self is rt_edge.start_node, "rt_edge's start_node should be oneself."
                 self.rt_edge = rt_edge
+                rt_edge.kind = Edge.RT
                 rt_edge.end_node.rt_edge = rt_edge
     
     def blit(self, screen):
+        import pygame
         pygame.draw.circle(screen, self.color, self.loc, 5, 0)
     
-    def step(self, screen=None):
+    def step(self, screen=None, recorder=None, green=None, links=None):
+        """
+        :param recorder: optional EventRecorder notified of every discharged vehicle.
+        :param green: (lt, gs) green flags from the SignalController, looked up from inter.mode if None.
+        :param links: optional LinkStorage tracking the discharged vehicles, which also holds
+                      vehicles back while the next link is full.
+        :return: number of discharged vehicles
+        """
+        discharged = 0
         if self.is_incoming and not self.is_fringe:
-            for _ in range(self.v_star):
+            if green is None:
                 inter = self.inter
-                if self.lt_queue and inter.traffic_light[inter.mode, inter.idx_1[self.dir], inter.idx_2['lt']]:
+                green = inter.traffic_light[inter.mode, self.dir_code]
+            lt_green, gs_green = green
+            is_limited = links is not None and links.is_limited
+            for _ in range(self.v_star):
+                if self.lt_queue and lt_green and (not is_limited or links.admit(self.lt_edge.id)):
                     lt_vehicle = self.lt_queue.pop()
                     lt_vehicle.current = self.lt_edge
-                    lt_vehicle.current_idx += 1
                     lt_vehicle.timer = 0
-                if self.gs_queue and inter.traffic_light[inter.mode, inter.idx_1[self.dir], inter.idx_2['gs']]:
+                    discharged += 1
+                    if links is not None:
+                        links.move(lt_vehicle.route_edges[lt_vehicle.hop - 1].id, self.lt_edge.id)
+                    if recorder is not None:
+                        recorder.record(lt_vehicle.time, recorder.DISCHARGE, lt_vehicle.id, self.lt_edge.id)
+                if self.gs_queue and gs_green and (not is_limited or links.admit(self.gs_edge.id)):
                     gs_vehicle = self.gs_queue.pop()
                     gs_vehicle.current = self.gs_edge
-                    gs_vehicle.current_idx += 1
                     gs_vehicle.timer = 0
+                    discharged += 1
+                    if links is not None:
+                        links.move(gs_vehicle.route_edges[gs_vehicle.hop - 1].id, self.gs_edge.id)
+                    if recorder is not None:
+                        recorder.record(gs_vehicle.time, recorder.DISCHARGE, gs_vehicle.id, self.gs_edge.id)
         if screen is not None:
             self.blit(screen)
-        self.time += 1
\ No newline at end of file
+        self.time += 1
+        return discharged
\ No newline at end of file
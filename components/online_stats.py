@@ -0,0 +1,265 @@
+import math
+import numpy as np
+
+__all__ = ['RunningMoments', 'QuantileSketch', 'OnlineStatistics']
+
+
+class RunningMoments:
+    """
+    Streaming count, mean and variance (Welford's update, Chan et al.'s formula for batches and merges).
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=float)
+        if len(values):
+            mean = float(values.mean())
+            self.combine(len(values), mean, float(((values - mean) ** 2).sum()))
+
+    def merge(self, other):
+        self.combine(other.count, other.mean, other.m2)
+        return self
+
+    def combine(self, count, mean, m2):
+        total = self.count + count
+        if count == 0:
+            return
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def variance(self):
+        """
+        Sample variance, nan with fewer than two values.
+        """
+        return self.m2 / (self.count - 1) if self.count > 1 else float('nan')
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def get_state(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2}
+
+    def set_state(self, state):
+        self.count, self.mean, self.m2 = state['count'], state['mean'], state['m2']
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch of non-negative values with logarithmic buckets (as in DDSketch):
+    value x > 0 falls in bucket ceil(log_gamma(x)), and every quantile is returned with a relative
+    error of at most relative_accuracy. The number of buckets only grows with the log of the value
+    range, and sketches with the same accuracy merge exactly by adding their bucket counts.
+    """
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        # counts[k] is the number of values in bucket offset + k.
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.offset = 0
+        self.zero_count = 0
+        self.count = 0
+
+    def key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def cover(self, low, high):
+        """
+        Grows counts to hold the buckets low..high.
+        """
+        if len(self.counts) == 0:
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            self.offset = low
+            return
+        start = min(low, self.offset)
+        end = max(high, self.offset + len(self.counts) - 1)
+        if start < self.offset or end >= self.offset + len(self.counts):
+            counts = np.zeros(end - start + 1, dtype=np.int64)
+            counts[self.offset - start:self.offset - start + len(self.counts)] = self.counts
+            self.counts = counts
+            self.offset = start
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zero_count += 1
+            return
+        key = self.key(value)
+        if not self.offset <= key < self.offset + len(self.counts):
+            self.cover(key, key)
+        self.counts[key - self.offset] += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=float)
+        positive = values[values > 0]
+        self.count += len(values)
+        self.zero_count += len(values) - len(positive)
+        if len(positive) == 0:
+            return
+        keys = np.ceil(np.log(positive) / self.log_gamma).astype(np.int64)
+        low = int(keys.min())
+        self.cover(low, int(keys.max()))
+        counts = np.bincount(keys - low)
+        self.counts[low - self.offset:low - self.offset + len(counts)] += counts
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative_accuracy can be merged.")
+        self.count += other.count
+        self.zero_count += other.zero_count
+        if len(other.counts):
+            self.cover(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+        return self
+
+    def quantile(self, q):
+        """
+        Approximate q-quantile (0 <= q <= 1), nan if the sketch is empty.
+        """
+        if self.count == 0:
+            return float('nan')
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        k = int(np.searchsorted(np.cumsum(self.counts), rank - self.zero_count, side='right'))
+        return 2 * self.gamma ** (self.offset + k) / (self.gamma + 1)
+
+    def get_state(self):
+        meta = {'relative_accuracy': self.relative_accuracy, 'offset': self.offset,
+                'zero_count': self.zero_count, 'count': self.count}
+        return meta, self.counts.copy()
+
+    def set_state(self, meta, counts):
+        self.__init__(meta['relative_accuracy'])
+        self.offset, self.zero_count, self.count = meta['offset'], meta['zero_count'], meta['count']
+        self.counts = np.array(counts, dtype=np.int64)
+
+
+class OnlineStatistics:
+    """
+    Trip and delay statistics updated as vehicles finish and wait, so that they can be read at any tick
+    without going over the vehicles or the stored trips. Statistics of disjoint sets of trips, e.g. of the
+    tiles of a partitioned run or of replications of one scenario, are combined with merge.
+        travel_time, travel_deviation, wait_time : RunningMoments of the finished trips
+        travel_time_sketch                       : QuantileSketch of the travel times
+        od_count, od_delay                       : (origins, destinations) number and summed travel deviation
+                                                   of the finished trips, by index in
+                                                   Graph.is_outgoing_fringe_nodes and is_incoming_fringe_nodes
+        queue_delay                              : vehicle-ticks spent waiting in every lt/gs queue, ordered as
+                                                   Graph.queue_lengths().ravel()
+    """
+    def __init__(self, num_origins, num_destinations, num_queues, relative_accuracy=0.01):
+        self.travel_time = RunningMoments()
+        self.travel_deviation = RunningMoments()
+        self.wait_time = RunningMoments()
+        self.travel_time_sketch = QuantileSketch(relative_accuracy)
+        self.od_count = np.zeros((num_origins, num_destinations), dtype=np.int64)
+        self.od_delay = np.zeros((num_origins, num_destinations), dtype=np.int64)
+        self.queue_delay = np.zeros(num_queues, dtype=np.int64)
+
+    @classmethod
+    def for_graph(cls, graph, relative_accuracy=0.01):
+        return cls(len(graph.is_outgoing_fringe_nodes), len(graph.is_incoming_fringe_nodes),
+                   2 * len(graph.queue_nodes), relative_accuracy=relative_accuracy)
+
+    @property
+    def count(self):
+        return self.travel_time.count
+
+    def add_trip(self, origin, destination, start_time, finish_time, min_travel_time, cum_wait_time):
+        travel_time = finish_time - start_time
+        self.travel_time.add(travel_time)
+        self.travel_deviation.add(travel_time - min_travel_time)
+        self.wait_time.add(cum_wait_time)
+        self.travel_time_sketch.add(travel_time)
+        self.od_count[origin, destination] += 1
+        self.od_delay[origin, destination] += travel_time - min_travel_time
+
+    def add_trips(self, origin, destination, start_time, finish_time, min_travel_time, cum_wait_time):
+        """
+        Batch version of add_trip, with one array per argument.
+        """
+        travel_time = np.asarray(finish_time, dtype=np.int64) - start_time
+        deviation = travel_time - min_travel_time
+        self.travel_time.extend(travel_time)
+        self.travel_deviation.extend(deviation)
+        self.wait_time.extend(cum_wait_time)
+        self.travel_time_sketch.extend(travel_time)
+        np.add.at(self.od_count, (origin, destination), 1)
+        np.add.at(self.od_delay, (origin, destination), deviation)
+
+    def add_waits(self, queue_lengths, ticks=1):
+        """
+        Counts ticks ticks of waiting for every vehicle in the queues.
+        :param queue_lengths: vehicles waiting in every queue, in the order of queue_delay.
+        """
+        self.queue_delay += ticks * np.asarray(queue_lengths).reshape(-1)
+
+    def intersection_delay(self):
+        """
+        :return: vehicle-ticks spent waiting at every intermediate intersection, ordered as Graph.interm_inters
+        """
+        return self.queue_delay.reshape(-1, 8).sum(axis=1)
+
+    def od_mean_delay(self):
+        """
+        :return: mean travel deviation of every (origin, destination) pair, nan for pairs without trips
+        """
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return self.od_delay / self.od_count
+
+    def merge(self, other):
+        self.travel_time.merge(other.travel_time)
+        self.travel_deviation.merge(other.travel_deviation)
+        self.wait_time.merge(other.wait_time)
+        self.travel_time_sketch.merge(other.travel_time_sketch)
+        self.od_count += other.od_count
+        self.od_delay += other.od_delay
+        self.queue_delay += other.queue_delay
+        return self
+
+    def summary(self, quantiles=(0.5, 0.95, 0.99)):
+        """
+        :return: dict of the trip count, mean and standard deviation of travel time, travel deviation and
+                 wait time, and travel time quantiles as travel_time_p50 etc.
+        """
+        summary = {'count': self.count}
+        for name in ('travel_time', 'travel_deviation', 'wait_time'):
+            moments = getattr(self, name)
+            summary[name + '_mean'] = moments.mean if moments.count else float('nan')
+            summary[name + '_std'] = moments.std
+        for q in quantiles:
+            summary[f'travel_time_p{100 * q:g}'] = self.travel_time_sketch.quantile(q)
+        return summary
+
+    def get_state(self):
+        """
+        :return: (JSON-serializable dict, dict of name -> NumPy array), restored by set_state
+        """
+        sketch_meta, sketch_counts = self.travel_time_sketch.get_state()
+        meta = {name: getattr(self, name).get_state() for name in ('travel_time', 'travel_deviation', 'wait_time')}
+        meta['travel_time_sketch'] = sketch_meta
+        arrays = {'travel_time_sketch': sketch_counts, 'od_count': self.od_count.copy(),
+                  'od_delay': self.od_delay.copy(), 'queue_delay': self.queue_delay.copy()}
+        return meta, arrays
+
+    def set_state(self, meta, arrays):
+        for name in ('travel_time', 'travel_deviation', 'wait_time'):
+            getattr(self, name).set_state(meta[name])
+        self.travel_time_sketch.set_state(meta['travel_time_sketch'], arrays['travel_time_sketch'])
+        for name in ('od_count', 'od_delay', 'queue_delay'):
+            getattr(self, name)[:] = arrays[name]
@@ -0,0 +1,189 @@
+import multiprocessing as mp
+import numpy as np
+from components.graph import Graph
+from components.array_engine import ArrayEngine
+from components.edge import Edge
+from components.online_stats import OnlineStatistics
+
+__all__ = ['TileEngine', 'PartitionedSimulation']
+
+
+def tile_of(i, j, H, L, tiles):
+    """
+    Tile id of the intermediate intersection (i, j) when the grid is split into tiles = (rows, cols) rectangles.
+    """
+    rows, cols = tiles
+    return ((i - 1) * rows // H) * cols + (j - 1) * cols // L
+
+
+def edge_owners(graph, tiles):
+    """
+    Tile owning every edge: the tile of the intersection where the edge ends,
+    or where it starts for links leaving the grid. A vehicle is simulated by the owner of its current edge.
+    """
+    H, L = graph.H, graph.L
+    owners = np.zeros(len(graph.edges), dtype=np.int32)
+    for edge in graph.edges:
+        inter = edge.start_node.inter if edge.end_node.is_fringe else edge.end_node.inter
+        owners[edge.id] = tile_of(inter.i, inter.j, H, L, tiles)
+    return owners
+
+
+class TileEngine(ArrayEngine):
+    """
+    ArrayEngine simulating the vehicles of one tile of a partitioned grid under the fixed-time signal plan.
+    Vehicles that enter an edge owned by another tile are exported at the end of every window.
+    """
+    def __init__(self, graph, tile, owners, capacity=1024):
+        super(TileEngine, self).__init__(graph, capacity=capacity)
+        self.tile = tile
+        self.owners = owners
+        self.time = graph.time
+
+    def signal_modes(self):
+        return np.full(len(self.queue_nodes), (self.time % 240) // 30, dtype=np.intp)
+
+    def run(self, start, end, spawns):
+        """
+        Simulates ticks start..end-1.
+        :param spawns: list of (time, seq, edge_ids, min_travel_time), sorted by time.
+        """
+        k = 0
+        for time in range(start, end):
+            self.time = time
+            self.discharge()
+            self.graph.stats.add_waits(self.queue_length)
+            while k < len(spawns) and spawns[k][0] == time:
+                _, seq, edge_ids, min_travel_time = spawns[k]
+                self.links.enter(edge_ids[0])
+                self.add_vehicle(edge_ids, min_travel_time, time, seq=seq)
+                k += 1
+            self.advance(time)
+        self.time = end
+
+    def export_vehicles(self):
+        """
+        Removes the vehicles whose current edge belongs to another tile.
+        :return: dict of tile -> packed vehicles (see pack)
+        """
+        n = self.num_vehicles
+        moving = np.flatnonzero(self.state[:n] == ArrayEngine.ON_EDGE)
+        owners = self.owners[self.routes[self.ptr[moving]]]
+        leaving = moving[owners != self.tile]
+        self.links.leave_all(self.routes[self.ptr[leaving]])
+        exports = {}
+        for tile in np.unique(owners[owners != self.tile]).tolist():
+            exports[tile] = self.pack(leaving[self.owners[self.routes[self.ptr[leaving]]] == tile])
+        self.release(leaving)
+        return exports
+
+    def pack(self, slots):
+        remaining = [self.routes[self.ptr[v]:self.route_start[v] + self.route_len[v]] for v in slots.tolist()]
+        return {
+            'seq': self.seq[slots], 'timer': self.timer[slots], 'cum_wait_time': self.cum_wait_time[slots],
+            'start_time': self.start_time[slots], 'min_travel_time': self.min_travel_time[slots],
+            'origin': self.origin[slots], 'destination': self.destination[slots], 'routes': remaining,
+        }
+
+    def import_vehicles(self, packed):
+        for k, edge_ids in enumerate(packed['routes']):
+            v = self.add_vehicle(edge_ids, packed['min_travel_time'][k], packed['start_time'][k], seq=packed['seq'][k])
+            self.links.enter(edge_ids[0], flow=False)
+            self.timer[v] = packed['timer'][k]
+            self.cum_wait_time[v] = packed['cum_wait_time'][k]
+            self.origin[v] = packed['origin'][k]
+            self.destination[v] = packed['destination'][k]
+
+
+def tile_worker(conn, H, L, tile, tiles):
+    graph = Graph(H, L)
+    engine = TileEngine(graph, tile, edge_owners(graph, tiles))
+    while True:
+        message = conn.recv()
+        if message[0] == 'run':
+            _, start, end, spawns, imports = message
+            for packed in imports:
+                engine.import_vehicles(packed)
+            engine.run(start, end, spawns)
+            conn.send(engine.export_vehicles())
+        else:
+            trips = graph.trips
+            conn.send((trips.count, trips.sum_cum_wait_time, trips.sum_travel_deviation, engine.num_active, graph.stats))
+            conn.close()
+            return
+
+
+class PartitionedSimulation:
+    """
+    Graph simulation split into rectangular tiles of intermediate intersections, one worker process per tile.
+    Link edges take Graph.delta_tL ticks, so a vehicle entering a link to another tile cannot reach
+    its end before the next synchronization if windows are at most that long. Workers therefore only
+    exchange vehicles once per window. Spawns are drawn centrally from the seeded random stream in
+    the same order as Graph.step, so the metrics are identical to a single-process run with the same seed.
+    """
+    def __init__(self, H, L, tiles=(2, 2), seed=None, t_sim=30 * 60, spawn_period=1):
+        self.graph = Graph(H, L, seed=seed)
+        self.tiles = tiles
+        self.t_sim = t_sim
+        self.spawn_period = spawn_period
+        self.owners = edge_owners(self.graph, tiles)
+        self.window = min(edge.delta_t for edge in self.graph.edges if edge.kind == Edge.LINK)
+
+    def draw_spawns(self, start, end):
+        """
+        Spawns of ticks start..end-1, grouped by the tile owning their first edge.
+        """
+        spawns = {}
+        route = self.graph.route_service.route
+        for time in range(start, end):
+            if time % self.spawn_period == 0:
+                _, _, edge_ids, min_travel_time = route(*self.graph.sample_trip())
+                tile = int(self.owners[edge_ids[0]])
+                spawns.setdefault(tile, []).append((time, self.num_spawned, edge_ids, min_travel_time))
+                self.num_spawned += 1
+        return spawns
+
+    def run(self):
+        """
+        :return: (average cumulative wait time, average travel deviation, number of circulating vehicles)
+        """
+        H, L = self.graph.H, self.graph.L
+        num_tiles = self.tiles[0] * self.tiles[1]
+        self.num_spawned = 0
+        context = mp.get_context()
+        connections = []
+        workers = []
+        for tile in range(num_tiles):
+            parent, child = context.Pipe()
+            worker = context.Process(target=tile_worker, args=(child, H, L, tile, self.tiles), daemon=True)
+            worker.start()
+            connections.append(parent)
+            workers.append(worker)
+        imports = {tile: [] for tile in range(num_tiles)}
+        for start in range(0, self.t_sim, self.window):
+            end = min(start + self.window, self.t_sim)
+            spawns = self.draw_spawns(start, end)
+            for tile, conn in enumerate(connections):
+                conn.send(('run', start, end, spawns.get(tile, []), imports[tile]))
+            imports = {tile: [] for tile in range(num_tiles)}
+            for conn in connections:
+                for tile, packed in conn.recv().items():
+                    imports[tile].append(packed)
+        count = sum_cum_wait_time = sum_travel_deviation = 0
+        # Every trip finishes in exactly one tile, so the tile statistics merge into those of the whole run.
+        self.stats = OnlineStatistics.for_graph(self.graph)
+        num_active = sum(len(packed['seq']) for packs in imports.values() for packed in packs)
+        for conn in connections:
+            conn.send(('finish',))
+            c, w, d, a, stats = conn.recv()
+            self.stats.merge(stats)
+            count += c
+            sum_cum_wait_time += w
+            sum_travel_deviation += d
+            num_active += a
+        for worker in workers:
+            worker.join()
+        self.avg_cum_wait_time = sum_cum_wait_time / count if count else float('nan')
+        self.avg_travel_deviation = sum_travel_deviation / count if count else float('nan')
+        self.num_circulating_vehicles = num_active
+        return self.avg_cum_wait_time, self.avg_travel_deviation, self.num_circulating_vehicles
@@ -0,0 +1,158 @@
+import glob
+import os
+import queue
+import threading
+import numpy as np
+
+__all__ = ['EventRecorder', 'load_events']
+
+
+class EventRecorder:
+    """
+    Opt-in columnar log of simulation events, enabled with graph.recorder = EventRecorder(directory).
+    Events are written into preallocated chunks; full chunks are saved as numbered .npz segments by a
+    background thread. At most num_buffers chunks exist at once, so recording blocks (instead of
+    growing) if the disk falls behind.
+    Columns:
+        time    : tick of the event
+        event   : ENTER (vehicle entered edge without queueing: spawn, right turn or link),
+                  QUEUE (vehicle joined the queue of edge), DISCHARGE (vehicle left its queue and entered edge),
+                  FINISH (vehicle left the grid at the end of edge) or PHASE (intersection inter switched to mode)
+        vehicle : Vehicle.id (object engine) or spawn order (array engines), -1 for PHASE
+        edge    : Edge.id, -1 for PHASE
+        inter   : index in Graph.inters for PHASE, -1 otherwise
+        mode    : new mode for PHASE, -1 otherwise
+    """
+    ENTER, QUEUE, DISCHARGE, FINISH, PHASE = 0, 1, 2, 3, 4
+    columns = (('time', np.int64), ('event', np.int8), ('vehicle', np.int64),
+               ('edge', np.int32), ('inter', np.int32), ('mode', np.int8))
+
+    def __init__(self, directory, chunk_size=65536, num_buffers=4, compress=False):
+        """
+        :param directory: where the segments events-00000.npz, events-00001.npz, ... are written.
+        :param chunk_size: number of events per segment.
+        :param num_buffers: number of preallocated chunks, at least 2.
+        :param compress: write compressed segments.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.compress = compress
+        self.free = queue.Queue()
+        for _ in range(max(num_buffers, 2)):
+            self.free.put({name: np.zeros(chunk_size, dtype=dtype) for name, dtype in EventRecorder.columns})
+        self.buffer = self.free.get()
+        self.size = 0
+        self.count = 0
+        self.num_segments = 0
+        self.modes = None
+        self.error = None
+        self.pending = queue.Queue()
+        self.writer = threading.Thread(target=self.write_segments, daemon=True)
+        self.writer.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def record(self, time, event, vehicle=-1, edge=-1, inter=-1, mode=-1):
+        buffer = self.buffer
+        k = self.size
+        buffer['time'][k] = time
+        buffer['event'][k] = event
+        buffer['vehicle'][k] = vehicle
+        buffer['edge'][k] = edge
+        buffer['inter'][k] = inter
+        buffer['mode'][k] = mode
+        self.size += 1
+        self.count += 1
+        if self.size == self.chunk_size:
+            self.flush()
+
+    def extend(self, time, event, vehicle=-1, edge=-1, inter=-1, mode=-1):
+        """
+        Records a batch of events. Every argument is an array or a scalar shared by the whole batch.
+        """
+        values = dict(time=time, event=event, vehicle=vehicle, edge=edge, inter=inter, mode=mode)
+        lengths = [len(value) for value in values.values() if np.ndim(value) > 0]
+        total = lengths[0] if lengths else 1
+        values = {name: np.broadcast_to(value, total) for name, value in values.items()}
+        self.count += total
+        done = 0
+        while done < total:
+            k = min(total - done, self.chunk_size - self.size)
+            for name, _ in EventRecorder.columns:
+                self.buffer[name][self.size:self.size+k] = values[name][done:done+k]
+            self.size += k
+            done += k
+            if self.size == self.chunk_size:
+                self.flush()
+
+    def record_phases(self, time, modes, offset=0):
+        """
+        Records a PHASE event for every intersection whose mode changed since the last call.
+        :param modes: mode of every intersection, modes[k] being that of Graph.inters[offset + k], -1 before the first tick.
+        """
+        modes = np.asarray(modes, dtype=np.int8)
+        if self.modes is None:
+            self.modes = np.full(len(modes), -1, dtype=np.int8)
+        changed = np.flatnonzero(modes != self.modes)
+        if len(changed):
+            self.extend(time, EventRecorder.PHASE, inter=changed + offset, mode=modes[changed])
+            self.modes = modes
+
+    def flush(self):
+        """
+        Hands the current chunk to the writer thread and continues in a free one.
+        """
+        self.check()
+        if self.size == 0:
+            return
+        self.pending.put((self.buffer, self.size, self.num_segments))
+        self.num_segments += 1
+        self.buffer = self.free.get()
+        self.size = 0
+
+    def close(self):
+        """
+        Writes the remaining events and waits for the writer thread.
+        """
+        if self.writer.is_alive():
+            self.flush()
+            self.pending.put(None)
+            self.writer.join()
+        self.check()
+
+    def check(self):
+        if self.error is not None:
+            raise RuntimeError(f"Writing events to '{self.directory}' failed.") from self.error
+
+    def write_segments(self):
+        save = np.savez_compressed if self.compress else np.savez
+        while True:
+            item = self.pending.get()
+            if item is None:
+                return
+            buffer, size, k = item
+            try:
+                if self.error is None:
+                    path = os.path.join(self.directory, f'events-{k:05d}.npz')
+                    save(path, **{name: buffer[name][:size] for name, _ in EventRecorder.columns})
+            except Exception as error:
+                self.error = error
+            self.free.put(buffer)
+
+
+def load_events(directory):
+    """
+    All events written by an EventRecorder to directory, as a dict of column arrays in recording order.
+    """
+    paths = sorted(glob.glob(os.path.join(directory, 'events-*.npz')))
+    segments = []
+    for path in paths:
+        with np.load(path) as segment:
+            segments.append({name: segment[name] for name, _ in EventRecorder.columns})
+    return {name: np.concatenate([segment[name] for segment in segments] + [np.zeros(0, dtype=dtype)])
+            for name, dtype in EventRecorder.columns}
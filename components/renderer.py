@@ -0,0 +1,131 @@
+import threading
+import time
+import numpy as np
+import pygame
+from pygame.math import Vector2
+from components.methods.methods import center_blit, load_font, rotate_image
+
+__all__ = ['Renderer', 'SimulationThread']
+
+
+class Renderer:
+    """
+    Draws Graph.view() snapshots instead of drawing from inside Graph.step.
+    Intersection images, nodes and edges never change, so they are drawn once to a cached
+    background surface; a frame is that background, the mode labels and the vehicles.
+    Vehicle locations are interpolated between the last two views, so motion stays smooth
+    when the display rate is higher than the rate at which views arrive.
+    """
+    vehicle_image_path = 'images/vehicle_opaque_50.png'
+    font_path = 'fonts/NanumGothic.ttf'
+
+    def __init__(self, graph):
+        self.graph = graph
+        # Intersection (i, j) is drawn at (240 j, 240 i), see to_vector2.
+        self.size = (240 * (graph.L + 1), 240 * (graph.H + 1))
+        self.background = None
+        self.frame = None
+        self.labels = {}
+        self.previous = None
+        self.current = None
+        self.received = 0
+        self.interval = 0
+
+    def build_background(self):
+        self.background = pygame.Surface(self.size)
+        for inter in self.graph.inters:
+            if inter.image is None:
+                inter.load_image()
+            center_blit(inter.display_image, inter.loc, self.background)
+        for node in self.graph.nodes:
+            node.blit(self.background)
+        for edge in self.graph.edges:
+            edge.blit(self.background)
+        self.frame = pygame.Surface(self.size)
+
+    def label(self, mode):
+        text = self.labels.get(mode)
+        if text is None:
+            text = load_font(self.font_path, 10).render('None' if mode < 0 else f'{mode}', True, (255, 255, 255))
+            self.labels[mode] = text
+        return text
+
+    def update(self, view):
+        """
+        Sets the newest view. Views of a tick that is already displayed are ignored.
+        """
+        if self.current is not None and view['time'] == self.current['time']:
+            return
+        now = time.perf_counter()
+        self.previous, self.current = self.current, view
+        self.interval = now - self.received
+        self.received = now
+
+    def vehicle_locations(self):
+        locs = self.current['locs']
+        if self.previous is None or self.interval <= 0:
+            return locs
+        alpha = min((time.perf_counter() - self.received) / self.interval, 1.0)
+        _, previous_k, current_k = np.intersect1d(self.previous['ids'], self.current['ids'],
+                                                  assume_unique=True, return_indices=True)
+        locs = locs.copy()
+        locs[current_k] = (1 - alpha) * self.previous['locs'][previous_k] + alpha * locs[current_k]
+        return locs
+
+    def draw(self, screen):
+        """
+        Draws the current view to screen, scaled to fit if the grid is larger than the screen.
+        """
+        if self.current is None:
+            return
+        if self.background is None:
+            self.build_background()
+        frame = self.frame if self.size != screen.get_size() else screen
+        frame.blit(self.background, (0, 0))
+        for inter, mode in zip(self.graph.inters, self.current['modes'].tolist()):
+            center_blit(self.label(mode), inter.loc, frame)
+        for (x, y), theta in zip(self.vehicle_locations().tolist(), self.current['theta'].tolist()):
+            center_blit(rotate_image(self.vehicle_image_path, -theta-90), Vector2(x, y), frame)
+        if frame is not screen:
+            pygame.transform.scale(frame, screen.get_size(), screen)
+
+
+class SimulationThread(threading.Thread):
+    """
+    Steps a graph headless in the background, at ticks_per_second or as fast as possible if None,
+    until t_sim. The drawing side calls latest() at its own rate; the thread only builds a view
+    when one was requested since the last tick.
+    """
+    def __init__(self, graph, ticks_per_second=None):
+        super(SimulationThread, self).__init__(daemon=True)
+        self.graph = graph
+        self.ticks_per_second = ticks_per_second
+        self.view = graph.view()
+        self.requested = threading.Event()
+        self.stopped = threading.Event()
+
+    def run(self):
+        graph = self.graph
+        start = time.perf_counter()
+        start_time = graph.time
+        while not self.stopped.is_set() and graph.time <= graph.t_sim:
+            if self.ticks_per_second is not None:
+                ahead = (graph.time - start_time) / self.ticks_per_second - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+            graph.step()
+            if self.requested.is_set():
+                self.requested.clear()
+                self.view = graph.view()
+        self.view = graph.view()
+
+    def latest(self):
+        """
+        Most recently published view; also asks for a fresh one after the next tick.
+        """
+        self.requested.set()
+        return self.view
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
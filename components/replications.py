@@ -0,0 +1,128 @@
+"""
+Independent, seeded replications of headless Graph simulations on a process pool.
+
+    python -m components.replications --reps 20 --size 3x3 5x5 --spawn-period 1 2 --engine array
+"""
+import argparse
+import csv
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from components.graph import Graph
+
+__all__ = ['replication_seeds', 'run_replication', 'run_replications', 'summarize']
+
+metric_names = ('avg_cum_wait_time', 'avg_travel_deviation', 'num_circulating_vehicles')
+# Keys of OnlineStatistics.summary reported along with the metrics.
+stat_names = ('travel_time_std', 'travel_time_p50', 'travel_time_p95', 'travel_time_p99')
+
+# Two-sided 95% Student t quantiles by degrees of freedom; larger samples use the normal quantile.
+t_975 = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262,
+         10: 2.228, 11: 2.201, 12: 2.179, 13: 2.160, 14: 2.145, 15: 2.131, 16: 2.120, 17: 2.110,
+         18: 2.101, 19: 2.093, 20: 2.086, 21: 2.080, 22: 2.074, 23: 2.069, 24: 2.064, 25: 2.060,
+         26: 2.056, 27: 2.052, 28: 2.048, 29: 2.045, 30: 2.042}
+
+
+def replication_seeds(n, base_seed=0):
+    """
+    n statistically independent seeds derived from base_seed.
+    """
+    return [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(base_seed).spawn(n)]
+
+
+def run_replication(H, L, seed, engine='array', t_sim=30 * 60, spawn_period=1):
+    """
+    Runs one headless Graph to t_sim and returns its final metrics as a dict.
+    """
+    graph = Graph(H, L, engine=engine, seed=seed)
+    graph.t_sim = t_sim
+    graph.spawn_period = spawn_period
+    graph.verbose = False
+    graph.run()
+    row = {'H': H, 'L': L, 'spawn_period': spawn_period, 'engine': engine, 't_sim': t_sim, 'seed': seed}
+    for name in metric_names:
+        row[name] = float(getattr(graph, name))
+    summary = graph.stats.summary()
+    for name in stat_names:
+        row[name] = float(summary[name])
+    return row
+
+
+def run_replications(configs, reps, base_seed=0, workers=None):
+    """
+    Runs reps replications of every config across a process pool.
+    :param configs: list of dicts of run_replication keyword arguments (without seed).
+    :param reps: number of replications per config.
+    :param base_seed: replication k of every config uses the k-th seed derived from base_seed,
+                      so configs are compared under common random numbers.
+    :param workers: number of worker processes, os.cpu_count() by default.
+    :return: list of per-replication rows, in (config, replication) order.
+    """
+    seeds = replication_seeds(reps, base_seed)
+    jobs = [dict(config, seed=seed) for config in configs for seed in seeds]
+    if workers == 1:
+        return [run_replication(**job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_replication, **job) for job in jobs]
+        return [future.result() for future in futures]
+
+
+def summarize(rows, keys=('H', 'L', 'spawn_period', 'engine', 't_sim')):
+    """
+    Mean and 95% confidence interval of every metric, grouped by keys.
+    :return: list of dicts with n, <metric>_mean, <metric>_ci_low and <metric>_ci_high.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row[key] for key in keys), []).append(row)
+    summary = []
+    for group_key, group in groups.items():
+        entry = dict(zip(keys, group_key))
+        n = len(group)
+        entry['n'] = n
+        for name in metric_names + stat_names:
+            values = np.array([row[name] for row in group], dtype=float)
+            mean = float(np.mean(values))
+            half_width = float('nan')
+            if n > 1:
+                half_width = t_975.get(n - 1, 1.960) * float(np.std(values, ddof=1)) / math.sqrt(n)
+            entry[name + '_mean'] = mean
+            entry[name + '_ci_low'] = mean - half_width
+            entry[name + '_ci_high'] = mean + half_width
+        summary.append(entry)
+    return summary
+
+
+def write_csv(rows, file):
+    writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run seeded Graph replications on a process pool.')
+    parser.add_argument('--reps', type=int, default=10, help='replications per configuration')
+    parser.add_argument('--size', nargs='+', default=['3x3'], help='grid sizes as HxL')
+    parser.add_argument('--spawn-period', nargs='+', type=int, default=[1], help='ticks between spawns')
+    parser.add_argument('--engine', default='array', choices=['object', 'array', 'event'])
+    parser.add_argument('--t-sim', type=int, default=30 * 60, help='simulation horizon in ticks')
+    parser.add_argument('--seed', type=int, default=0, help='base seed of the replications')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--rows', default=None, help='also write the per-replication rows to this CSV file')
+    args = parser.parse_args(argv)
+    configs = []
+    for size in args.size:
+        H, L = (int(x) for x in size.lower().split('x'))
+        for spawn_period in args.spawn_period:
+            configs.append({'H': H, 'L': L, 'spawn_period': spawn_period, 'engine': args.engine, 't_sim': args.t_sim})
+    rows = run_replications(configs, args.reps, base_seed=args.seed, workers=args.workers or os.cpu_count())
+    if args.rows is not None:
+        with open(args.rows, 'w', newline='') as file:
+            write_csv(rows, file)
+    write_csv(summarize(rows), sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
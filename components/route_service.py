@@ -0,0 +1,85 @@
+from collections import OrderedDict
+import numpy as np
+
+__all__ = ['RouteService']
+
+
+class RouteService:
+    """
+    Per-Graph routing tables.
+    Keeps the minimum travel time (sum of Edge.delta_t) between every outgoing and
+    incoming fringe node, computed once per pair, and an LRU cache of route templates
+    keyed by origin, destination and the shuffled sequence of directions.
+    Every route crosses the same numbers of links and intersections between a given pair, so the minimum
+    travel time is the summed delta_t of any of them, no graph search needed.
+    Routes are drawn and built on the graph's TransitionTables.
+    """
+    def __init__(self, graph, maxsize=65536):
+        """
+        :param graph: Graph whose edges are routed over.
+        :param maxsize: maximum number of cached route templates.
+        """
+        self.graph = graph
+        self.maxsize = maxsize
+        self.tables = graph.tables
+        # Row and column of every node id in min_travel_times, -1 for nodes that are not origins or destinations.
+        self.origin_index = graph.tables.node_origin.tolist()
+        self.destination_index = graph.tables.node_destination.tolist()
+        # -1 marks pairs that have not been computed yet.
+        self.min_travel_times = np.full((len(graph.is_outgoing_fringe_nodes), len(graph.is_incoming_fringe_nodes)), -1,
+                                        dtype=np.int64)
+        self.templates = OrderedDict()
+        # Source of the route shuffles, graph.rng if None (see Graph.set_demand).
+        self.rng = None
+        self.hits = 0
+        self.misses = 0
+
+    def precompute(self):
+        """
+        Fills the whole origin x destination minimum travel time table.
+        """
+        for start_node in self.graph.is_outgoing_fringe_nodes:
+            for end_node in self.graph.is_incoming_fringe_nodes:
+                self.min_travel_time(start_node, end_node)
+        return self.min_travel_times
+
+    def min_travel_time(self, start_node, end_node, edge_ids=None):
+        """
+        :param edge_ids: edge ids of a route from start_node to end_node if already built, else the unshuffled route is used.
+        :return: minimum travel time, the int64 maximum for pairs at the same intersection, which have no route.
+        """
+        row, col = self.origin_index[start_node.id], self.destination_index[end_node.id]
+        if self.min_travel_times[row, col] < 0:
+            if start_node.inter is end_node.inter:
+                self.min_travel_times[row, col] = np.iinfo(np.int64).max
+            else:
+                if edge_ids is None:
+                    route_dirs = self.tables.route_dirs(start_node.id, end_node.id, None)
+                    edge_ids = self.tables.route_edges(start_node.id, route_dirs)
+                self.min_travel_times[row, col] = int(self.tables.edge_delta_t[edge_ids].sum())
+        return int(self.min_travel_times[row, col])
+
+    def route(self, start_node, end_node):
+        """
+        Draws a random shortest route as Vehicle does and returns its cached template.
+        :return: (route_edges, route_turns, edge ids as an int32 array, min_travel_time)
+        """
+        rng = self.graph.rng if self.rng is None else self.rng
+        route_dirs = tuple(self.tables.route_dirs(start_node.id, end_node.id, rng))
+        key = (start_node.id, end_node.id, route_dirs)
+        template = self.templates.get(key)
+        if template is not None:
+            self.hits += 1
+            self.templates.move_to_end(key)
+            return template
+        self.misses += 1
+        edge_ids = self.tables.route_edges(start_node.id, route_dirs)
+        edges = self.graph.edges
+        route_edges = tuple(edges[k] for k in edge_ids)
+        route_turns = self.tables.edge_kind[edge_ids].tobytes()
+        edge_ids = np.array(edge_ids, dtype=np.int32)
+        template = (route_edges, route_turns, edge_ids, self.min_travel_time(start_node, end_node, edge_ids))
+        self.templates[key] = template
+        if len(self.templates) > self.maxsize:
+            self.templates.popitem(last=False)
+        return template
@@ -0,0 +1,186 @@
+"""
+Scenario files: one TOML file describes a whole headless run, so that batch jobs only differ by the file they pass.
+
+    python -m components run scenario.toml -o metrics.json
+    python -m components run scenario.toml --viewer
+
+Every key is optional and defaults to the values below, the settings of main.py:
+
+    name = "baseline"
+    seed = 0                  # seed of the graph's random.Random, which draws the trips and routes of the
+                              # default demand, and of the demand's generator unless [demand] seed is set
+    engine = "array"          # object, array or event
+    t_sim = 1800              # horizon in ticks, where the metrics are taken
+
+    [grid]
+    H = 3
+    L = 3
+    delta_tL = 150            # ticks to drive a link (Graph.delta_tL)
+    delta_tI = 15             # ticks to cross an intersection (Graph.delta_tI)
+    v_star = 2                # vehicles discharged per tick by every green queue (Node.v_star)
+    capacity = -1             # vehicles stored per link, negative for unlimited (Graph.set_capacity)
+
+    [signals]
+    policy = "fixed"          # fixed, green_wave or max_pressure (see components.signals)
+    cycle = 240               # fixed and green_wave
+    phase_length = 30         # fixed and green_wave
+    dir = "E"                 # green_wave
+    period = 30               # max_pressure
+
+    [demand]
+    kind = "default"          # default (Graph.sample_trip), periodic, poisson or trace (see components.demand)
+    period = 1                # default and periodic: ticks between vehicles
+    rate = 1.0                # poisson: vehicles per tick
+    times = []                # poisson: breakpoints of a piecewise constant rate, with one rate per breakpoint in
+    rates = []                #          rates, repeating every rate_period ticks if rate_period > 0
+    rate_period = 0
+    path = ""                 # trace: CSV or .npz file, relative to the scenario file
+    seed = 0                  # seed of the demand's generator, which draws its trips and routes (all kinds
+                              # but default); the top-level seed if not set
+
+The metrics are written as one JSON object: the scenario settings, the three metrics of Graph.metrics,
+the OnlineStatistics summary, the number of finished trips and the wall-clock time of the run.
+"""
+import copy
+import math
+import os
+import time
+import tomllib
+from components.edge import Edge
+from components.graph import Graph
+from components.demand import PeriodicDemand, PoissonDemand, TraceDemand, piecewise_rate
+from components.signals import FixedTimePolicy, MaxPressurePolicy, green_wave_offsets
+
+__all__ = ['default_scenario', 'load_scenario', 'build_graph', 'run_scenario']
+
+default_scenario = {
+    'name': 'baseline', 'seed': 0, 'engine': 'array', 't_sim': 30 * 60,
+    'grid': {'H': 3, 'L': 3, 'delta_tL': Edge.delta_tL, 'delta_tI': Edge.delta_tI, 'v_star': 2, 'capacity': -1},
+    'signals': {'policy': 'fixed', 'cycle': 240, 'phase_length': 30, 'dir': 'E', 'period': 30},
+    'demand': {'kind': 'default', 'period': 1, 'rate': 1.0, 'times': [], 'rates': [], 'rate_period': 0,
+               'path': '', 'seed': None},
+}
+policies = ('fixed', 'green_wave', 'max_pressure')
+demand_kinds = ('default', 'periodic', 'poisson', 'trace')
+
+
+def merge_defaults(values, defaults, section=''):
+    """
+    Copy of defaults updated with values, raising ValueError on keys that are not in defaults.
+    """
+    merged = copy.deepcopy(defaults)
+    for key, value in values.items():
+        if key not in defaults:
+            raise ValueError(f"Unknown scenario key '{section}{key}', expected one of {list(defaults)}.")
+        if isinstance(defaults[key], dict):
+            merged[key] = merge_defaults(value, defaults[key], section=f'{section}{key}.')
+        else:
+            merged[key] = value
+    return merged
+
+
+def fill_defaults(scenario):
+    """
+    Copy of scenario with the defaults filled in, the demand seed defaulting to the scenario seed.
+    """
+    scenario = merge_defaults(scenario, default_scenario)
+    if scenario['demand']['seed'] is None:
+        scenario['demand']['seed'] = scenario['seed']
+    return scenario
+
+
+def load_scenario(path):
+    """
+    Reads a scenario file and fills in the defaults.
+    :return: scenario dict with the keys of default_scenario
+    """
+    with open(path, 'rb') as file:
+        scenario = fill_defaults(tomllib.load(file))
+    demand_path = scenario['demand']['path']
+    if demand_path and not os.path.isabs(demand_path):
+        scenario['demand']['path'] = os.path.join(os.path.dirname(os.path.abspath(path)), demand_path)
+    return scenario
+
+
+def build_graph(scenario):
+    """
+    Graph set up as scenario describes, ready to run to scenario['t_sim'].
+    """
+    scenario = fill_defaults(scenario)
+    grid, signals, demand = scenario['grid'], scenario['signals'], scenario['demand']
+    if signals['policy'] not in policies:
+        raise ValueError(f"Unknown signal policy '{signals['policy']}', expected one of {list(policies)}.")
+    if demand['kind'] not in demand_kinds:
+        raise ValueError(f"Unknown demand kind '{demand['kind']}', expected one of {list(demand_kinds)}.")
+    graph = Graph(grid['H'], grid['L'], engine=scenario['engine'], seed=scenario['seed'], v_star=grid['v_star'],
+                  delta_tL=grid['delta_tL'], delta_tI=grid['delta_tI'])
+    if signals['policy'] == 'fixed':
+        graph.signals.policy = FixedTimePolicy(signals['cycle'], signals['phase_length'])
+    elif signals['policy'] == 'green_wave':
+        graph.signals.policy = FixedTimePolicy(signals['cycle'], signals['phase_length'],
+                                               offsets=green_wave_offsets(graph, signals['dir']))
+    else:
+        graph.signals.policy = MaxPressurePolicy(signals['period'])
+    if grid['capacity'] >= 0:
+        graph.set_capacity(grid['capacity'])
+    graph.t_sim = scenario['t_sim']
+    graph.verbose = False
+    if demand['kind'] == 'default':
+        graph.spawn_period = demand['period']
+    elif demand['kind'] == 'periodic':
+        graph.set_demand(PeriodicDemand(graph, period=demand['period'], seed=demand['seed']))
+    elif demand['kind'] == 'poisson':
+        rate = demand['rate']
+        if demand['times']:
+            rate = piecewise_rate(demand['times'], demand['rates'], period=demand['rate_period'] or None)
+        graph.set_demand(PoissonDemand(graph, rate=rate, seed=demand['seed']))
+    else:
+        graph.set_demand(TraceDemand.load(graph, demand['path'], seed=demand['seed']))
+    return graph
+
+
+def view(graph, fps=30):
+    """
+    Steps graph while drawing it in a pygame window until t_sim, or until the window is closed.
+    :param fps: frame rate cap, 0 for none.
+    """
+    import pygame
+    pygame.display.init()
+    pygame.font.init()
+    pygame.display.set_caption('Congestion Control Simulation')
+    screen = pygame.display.set_mode((960, 960))
+    clock = pygame.time.Clock()
+    while graph.time <= graph.t_sim:
+        if any(event.type == pygame.QUIT for event in pygame.event.get()):
+            break
+        screen.fill((0, 0, 0))
+        graph.step(screen=screen)
+        pygame.display.flip()
+        if fps > 0:
+            clock.tick(fps)
+    pygame.quit()
+
+
+def run_scenario(scenario, viewer=False, fps=30):
+    """
+    Builds and runs scenario to its horizon, headless at full speed unless viewer is True.
+    :return: JSON-serializable dict of the scenario settings and final metrics (nan is reported as None).
+    """
+    scenario = fill_defaults(scenario)
+    graph = build_graph(scenario)
+    start = time.perf_counter()
+    if viewer:
+        view(graph, fps=fps)
+    else:
+        graph.run()
+    seconds = time.perf_counter() - start
+    ticks = min(graph.time, graph.t_sim)
+    avg_cum_wait_time, avg_travel_deviation, num_circulating_vehicles = graph.metrics()
+    result = dict(scenario, time=ticks, avg_cum_wait_time=float(avg_cum_wait_time),
+                  avg_travel_deviation=float(avg_travel_deviation),
+                  num_circulating_vehicles=int(num_circulating_vehicles), num_trips=len(graph.trips))
+    summary = graph.stats.summary()
+    del summary['count']
+    result.update({key: float(value) for key, value in summary.items()})
+    result.update(wall_seconds=seconds, ticks_per_second=ticks / seconds if seconds > 0 else None)
+    return {key: None if isinstance(value, float) and math.isnan(value) else value for key, value in result.items()}
@@ -0,0 +1,188 @@
+import numpy as np
+from components.intersection import Intersection
+
+__all__ = ['SignalController', 'FixedTimePolicy', 'MaxPressurePolicy', 'ExternalPolicy', 'green_wave_offsets']
+
+
+class SignalController:
+    """
+    Signal state of every intersection of a Graph in one array.
+    Once per tick the policy picks the modes (rows of Intersection.traffic_light) of the intermediate
+    intersections, and the lt/gs green flags of every queue node are looked up in one vectorized
+    operation, so that neither policies nor engines do per-node work to evaluate the signals.
+    Fringe intersections have no queues and always follow the fixed-time plan.
+    """
+    def __init__(self, graph, policy=None):
+        self.graph = graph
+        self.policy = FixedTimePolicy() if policy is None else policy
+        self.num_fringe = len(graph.fringe_inters)
+        # Mode of every intersection of graph.inters, -1 before the first tick.
+        self.modes = np.full(len(graph.inters), -1, dtype=np.intp)
+        nodes = graph.queue_nodes
+        node_ids = [node.id for node in nodes]
+        self.node_inter = graph.tables.node_inter[node_ids]
+        self.node_dir = graph.tables.node_dir[node_ids]
+        # Mode and (lt, gs) green flags of every node of graph.queue_nodes.
+        self.node_modes = np.zeros(len(nodes), dtype=np.intp)
+        self.green = np.zeros((len(nodes), 2), dtype=bool)
+
+    @property
+    def interm_modes(self):
+        return self.modes[self.num_fringe:]
+
+    def step(self, time, screen=None):
+        """
+        Sets the modes of tick time. The Intersection objects are only updated when they are drawn on screen.
+        """
+        modes = self.modes
+        modes[:self.num_fringe] = (time % 240) // 30
+        modes[self.num_fringe:] = self.policy(self, time)
+        self.node_modes = modes[self.node_inter]
+        self.green = Intersection.traffic_light[self.node_modes, self.node_dir]
+        if screen is not None:
+            self.update_inters(time + 1)
+            for inter in self.graph.inters:
+                inter.blit(screen)
+
+    def update_inters(self, time):
+        """
+        Copies the modes to the mode of the Intersection objects, whose time is set to time.
+        """
+        for inter, mode in zip(self.graph.inters, self.modes.tolist()):
+            inter.mode = None if mode < 0 else mode
+            inter.time = time
+
+    def get_state(self):
+        """
+        Modes and policy, restored by set_state. Only the policies of this module can be saved.
+        :return: (JSON-serializable dict, dict of name -> NumPy array)
+        """
+        policy = self.policy
+        name = getattr(policy, 'name', None)
+        if policies.get(name) is not type(policy):
+            raise ValueError(f"Cannot save the state of signal policy {type(policy).__name__}, "
+                             f"expected one of {[cls.__name__ for cls in policies.values()]}.")
+        policy_meta, policy_arrays = policy.get_state()
+        arrays = {'policy/' + key: array for key, array in policy_arrays.items()}
+        arrays['modes'] = self.modes.copy()
+        return {'policy': name, 'policy_state': policy_meta}, arrays
+
+    def set_state(self, meta, arrays):
+        policy_arrays = {key[len('policy/'):]: array for key, array in arrays.items() if key.startswith('policy/')}
+        self.policy = policies[meta['policy']].from_state(self.graph, meta['policy_state'], policy_arrays)
+        self.modes[:] = arrays['modes']
+        self.node_modes = self.modes[self.node_inter]
+        self.green = Intersection.traffic_light[self.node_modes, self.node_dir]
+
+
+class FixedTimePolicy:
+    """
+    Cycles through the modes 0, 1, ..., cycle // phase_length - 1, as Intersection.step does.
+    :param offsets: optional ticks added to the time of every intermediate intersection, e.g. from green_wave_offsets.
+    """
+    name = 'fixed'
+
+    def __init__(self, cycle=240, phase_length=30, offsets=None):
+        self.cycle = cycle
+        self.phase_length = phase_length
+        self.offsets = None if offsets is None else np.asarray(offsets, dtype=np.int64)
+
+    @property
+    def is_default(self):
+        """
+        True for the plan of Intersection.step, which EventEngine schedules its phase changes for.
+        """
+        return self.cycle == 240 and self.phase_length == 30 and (self.offsets is None or not self.offsets.any())
+
+    def __call__(self, controller, time):
+        if self.offsets is None:
+            return (time % self.cycle) // self.phase_length
+        return ((time + self.offsets) % self.cycle) // self.phase_length
+
+    def get_state(self):
+        arrays = {} if self.offsets is None else {'offsets': self.offsets}
+        return {'cycle': self.cycle, 'phase_length': self.phase_length}, arrays
+
+    @classmethod
+    def from_state(cls, graph, meta, arrays):
+        return cls(meta['cycle'], meta['phase_length'], offsets=arrays.get('offsets'))
+
+
+def green_wave_offsets(graph, dir='E'):
+    """
+    Offsets for FixedTimePolicy that delay every intersection's cycle by the free-flow time from the previous
+    intersection in dir (one link and one internal edge), so that a platoon driving straight in dir
+    meets the same mode at every intersection.
+    """
+    di, dj = Intersection.tup_dir_dict[dir]
+    hop = graph.delta_tL + graph.delta_tI
+    return np.array([-(di * inter.i + dj * inter.j) * hop for inter in graph.interm_inters], dtype=np.int64)
+
+
+class MaxPressurePolicy:
+    """
+    Actuated control: every period ticks, each intermediate intersection switches to the mode whose
+    green movements have the most queued vehicles, and keeps its mode on ties.
+    :param modes: candidate modes, all rows of Intersection.traffic_light by default.
+    """
+    name = 'max_pressure'
+
+    def __init__(self, period=30, modes=None):
+        self.period = period
+        self.modes = np.arange(len(Intersection.traffic_light)) if modes is None else np.asarray(modes)
+        self.movements = Intersection.traffic_light[self.modes].astype(np.int64)
+
+    def __call__(self, controller, time):
+        current = controller.interm_modes
+        if time % self.period != 0 and (current >= 0).all():
+            return current
+        pressure = np.einsum('mdt,ndt->nm', self.movements, controller.graph.queue_lengths())
+        best = pressure.argmax(axis=1)
+        is_candidate = current[:, None] == self.modes[None, :]
+        current_pressure = np.where(is_candidate.any(axis=1),
+                                    (pressure * is_candidate).sum(axis=1), -1)
+        return np.where(current_pressure >= pressure[np.arange(len(best)), best], current, self.modes[best])
+
+    def get_state(self):
+        return {'period': self.period}, {'modes': self.modes}
+
+    @classmethod
+    def from_state(cls, graph, meta, arrays):
+        return cls(meta['period'], modes=np.array(arrays['modes']))
+
+
+class ExternalPolicy:
+    """
+    Modes supplied from outside, e.g. by a reinforcement learning agent: call set_actions before stepping.
+    """
+    name = 'external'
+
+    def __init__(self, graph):
+        self.actions = np.zeros(len(graph.interm_inters), dtype=np.intp)
+
+    def set_actions(self, actions):
+        """
+        :param actions: one mode (row of Intersection.traffic_light) per intermediate intersection.
+        """
+        actions = np.asarray(actions)
+        if actions.shape != self.actions.shape:
+            raise ValueError(f"actions should have shape {self.actions.shape}, got {actions.shape}.")
+        if ((actions < 0) | (actions >= len(Intersection.traffic_light))).any():
+            raise ValueError(f"actions should be modes in [0, {len(Intersection.traffic_light)}).")
+        self.actions[:] = actions
+
+    def __call__(self, controller, time):
+        return self.actions
+
+    def get_state(self):
+        return {}, {'actions': self.actions.copy()}
+
+    @classmethod
+    def from_state(cls, graph, meta, arrays):
+        policy = cls(graph)
+        policy.set_actions(arrays['actions'])
+        return policy
+
+
+# Policies whose state is saved in Graph snapshots, by name.
+policies = {policy.name: policy for policy in (FixedTimePolicy, MaxPressurePolicy, ExternalPolicy)}
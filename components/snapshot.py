@@ -0,0 +1,67 @@
+import json
+import numpy as np
+
+__all__ = ['save_snapshot', 'load_snapshot']
+
+MAGIC = b'GRIDSNAP'
+VERSION = 2
+# Array sections start at multiples of ALIGN bytes, so they can be viewed in place from a memory map.
+ALIGN = 64
+
+
+def padding(size):
+    return -size % ALIGN
+
+
+def save_snapshot(path, meta, arrays):
+    """
+    Writes a snapshot file: MAGIC, the length of a JSON header as a little-endian uint64,
+    the header (version, meta and the dtype, shape and offset of every array) and the raw array sections.
+    :param meta: JSON-serializable dict.
+    :param arrays: dict of name -> NumPy array.
+    """
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes + padding(array.nbytes)
+    header = json.dumps({'version': VERSION, 'meta': meta, 'arrays': sections}).encode()
+    header += b' ' * padding(len(MAGIC) + 8 + len(header))
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(header)).astype('<u8').tobytes())
+        file.write(header)
+        for name, array in arrays.items():
+            file.write(array.tobytes())
+            file.write(b'\0' * padding(array.nbytes))
+
+
+def load_snapshot(path, mmap=True):
+    """
+    Reads a file written by save_snapshot.
+    :param mmap: map the file read-only instead of reading it, so that many processes
+                 restoring the same snapshot share its pages.
+    :return: (meta, dict of name -> read-only NumPy array)
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"'{path}' is not a snapshot file.")
+        size = int(np.frombuffer(file.read(8), dtype='<u8')[0])
+        header = json.loads(file.read(size))
+    if header['version'] != VERSION:
+        raise ValueError(f"Unsupported snapshot version {header['version']}, expected {VERSION}.")
+    start = len(MAGIC) + 8 + size
+    if mmap:
+        buffer = np.memmap(path, dtype=np.uint8, mode='r')
+    else:
+        buffer = np.fromfile(path, dtype=np.uint8)
+        buffer.flags.writeable = False
+    arrays = {}
+    for name, section in header['arrays'].items():
+        dtype = np.dtype(section['dtype'])
+        shape = tuple(section['shape'])
+        begin = start + section['offset']
+        nbytes = int(np.prod(shape, dtype=np.int64)) * dtype.itemsize
+        arrays[name] = buffer[begin:begin + nbytes].view(dtype).reshape(shape)
+    return header['meta'], arrays
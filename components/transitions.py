@@ -0,0 +1,118 @@
+import numpy as np
+from components.component import Component
+from components.edge import Edge
+from components.node import Node
+
+__all__ = ['TransitionTables']
+
+
+class TransitionTables:
+    """
+    Integer-coded topology and geometry of a Graph, compiled once when the graph is built, so that
+    routing, stepping and vectorized engines index arrays instead of looking up direction strings,
+    node keys and per-object locations. Nodes are indexed by Node.id, edges by Edge.id, intersections by
+    their position in Graph.inters and directions by Component.dir_codes; -1 marks missing entries.
+        node_dir, node_inter          : direction code and intersection of every node
+        node_is_incoming, node_is_fringe
+        node_origin, node_destination : index of the node in Graph.is_outgoing_fringe_nodes and is_incoming_fringe_nodes
+        node_to_edge, node_from_edge  : edge leaving an outgoing node and edge entering an incoming node
+        turn_edge                     : (node, Edge.LT/GS/RT) -> internal edge of that turn from an incoming node
+        exit_edge                     : (node, dir code) -> internal edge from an incoming node to the outgoing node facing dir
+        node_grid                     : (i, j, dir code, is_incoming) -> node
+        edge_start, edge_end, edge_kind, edge_delta_t
+        node_xy, edge_start_xy, edge_end_xy, edge_theta : drawing coordinates and headings
+    Routing also keeps Python list copies of the tables it looks up one vehicle at a time.
+    """
+    def __init__(self, graph):
+        nodes, edges = graph.nodes, graph.edges
+        inter_ids = {id(inter): k for k, inter in enumerate(graph.inters)}
+        self.node_dir = np.array([node.dir_code for node in nodes], dtype=np.intp)
+        self.node_inter = np.array([inter_ids[id(node.inter)] for node in nodes], dtype=np.intp)
+        self.node_is_incoming = np.array([node.is_incoming for node in nodes], dtype=bool)
+        self.node_is_fringe = np.array([node.is_fringe for node in nodes], dtype=bool)
+        self.node_origin = np.full(len(nodes), -1, dtype=np.intp)
+        self.node_origin[[node.id for node in graph.is_outgoing_fringe_nodes]] = np.arange(len(graph.is_outgoing_fringe_nodes))
+        self.node_destination = np.full(len(nodes), -1, dtype=np.intp)
+        self.node_destination[[node.id for node in graph.is_incoming_fringe_nodes]] = np.arange(len(graph.is_incoming_fringe_nodes))
+
+        self.edge_start = np.array([edge.start_node.id for edge in edges], dtype=np.intp)
+        self.edge_end = np.array([edge.end_node.id for edge in edges], dtype=np.intp)
+        self.edge_kind = np.array([edge.kind for edge in edges], dtype=np.int8)
+        self.edge_delta_t = np.array([edge.delta_t for edge in edges], dtype=np.int32)
+        edge_ids = np.arange(len(edges))
+        is_link = self.edge_kind == Edge.LINK
+        self.node_to_edge = np.full(len(nodes), -1, dtype=np.intp)
+        self.node_to_edge[self.edge_start[is_link]] = edge_ids[is_link]
+        self.node_from_edge = np.full(len(nodes), -1, dtype=np.intp)
+        self.node_from_edge[self.edge_end[is_link]] = edge_ids[is_link]
+        self.turn_edge = np.full((len(nodes), 3), -1, dtype=np.intp)
+        self.turn_edge[self.edge_start[~is_link], self.edge_kind[~is_link]] = edge_ids[~is_link]
+        self.exit_edge = np.full((len(nodes), 4), -1, dtype=np.intp)
+        self.exit_edge[self.edge_start[~is_link], self.node_dir[self.edge_end[~is_link]]] = edge_ids[~is_link]
+
+        inter_ij = np.array([(inter.i, inter.j) for inter in graph.inters], dtype=np.intp)
+        self.inter_grid = np.full((graph.H + 2, graph.L + 2), -1, dtype=np.intp)
+        self.inter_grid[inter_ij[:, 0], inter_ij[:, 1]] = np.arange(len(graph.inters))
+        node_ij = inter_ij[self.node_inter]
+        self.node_grid = np.full((graph.H + 2, graph.L + 2, 4, 2), -1, dtype=np.intp)
+        self.node_grid[node_ij[:, 0], node_ij[:, 1], self.node_dir, self.node_is_incoming.astype(np.intp)] = np.arange(len(nodes))
+
+        # Same arithmetic as Node.set_location, on the intersection centers of Intersection.loc.
+        offsets = np.array(Node.offsets)
+        self.node_xy = 240 * node_ij[:, ::-1] + offsets[self.node_dir, self.node_is_incoming.astype(np.intp)]
+        self.edge_start_xy = self.node_xy[self.edge_start]
+        self.edge_end_xy = self.node_xy[self.edge_end]
+        self.edge_theta = np.array([edge.theta for edge in edges])
+
+        # Intersection (i, j) of the first intermediate node after every outgoing fringe node
+        # and of the last one before every incoming fringe node, as in make_route_dirs.
+        first = np.where(self.node_to_edge >= 0, self.edge_end[self.node_to_edge], -1)
+        last = np.where(self.node_from_edge >= 0, self.edge_start[self.node_from_edge], -1)
+        ij = node_ij.tolist()
+        self.route_first_ij = [tuple(ij[k]) if k >= 0 else None for k in first.tolist()]
+        self.route_last_ij = [tuple(ij[k]) if k >= 0 else None for k in last.tolist()]
+        self.route_node_dir = self.node_dir.tolist()
+        self.route_to_edge = self.node_to_edge.tolist()
+        self.route_exit_edge = self.exit_edge.tolist()
+        self.route_edge_end = self.edge_end.tolist()
+
+    def node(self, i, j, dir_code, is_incoming):
+        """
+        Id of the node of the intersection at (i, j) oriented in dir_code, or -1 if there is no such node.
+        """
+        if 0 <= i < self.node_grid.shape[0] and 0 <= j < self.node_grid.shape[1]:
+            return int(self.node_grid[i, j, dir_code, int(is_incoming)])
+        return -1
+
+    def route_dirs(self, start, end, rng):
+        """
+        make_route_dirs between the nodes with ids start and end, with direction codes instead of strings.
+        The shuffle makes the same draws from rng, so both give the same route for the same random state.
+        :param rng: random.Random shuffling the directions, or None to keep them unshuffled.
+        """
+        start_i, start_j = self.route_first_ij[start]
+        end_i, end_j = self.route_last_ij[end]
+        delta_i = end_i - start_i
+        delta_j = end_j - start_j
+        route_dirs = (abs(delta_i) * [3 if delta_i >= 0 else 1]) + (abs(delta_j) * [0 if delta_j >= 0 else 2])
+        if rng is not None:
+            rng.shuffle(route_dirs)
+        return [self.route_node_dir[start]] + route_dirs + [Component.op_dir_codes[self.route_node_dir[end]]]
+
+    def route_edges(self, start, route_dirs):
+        """
+        make_route_edges from the node with id start along direction codes.
+        :return: list of edge ids
+        """
+        to_edge, exit_edge, edge_end = self.route_to_edge, self.route_exit_edge, self.route_edge_end
+        route_edges = []
+        node = start
+        last = len(route_dirs) - 1
+        for k in range(len(route_dirs)):
+            link = to_edge[node]
+            route_edges.append(link)
+            if k != last:
+                turn = exit_edge[edge_end[link]][route_dirs[k + 1]]
+                route_edges.append(turn)
+                node = edge_end[turn]
+        return route_edges
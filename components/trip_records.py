@@ -0,0 +1,100 @@
+import numpy as np
+
+__all__ = ['TripRecords']
+
+
+class TripRecords:
+    """
+    Columnar store of finished trips with running aggregates.
+    Rows are written into a preallocated chunk; full chunks are kept in memory,
+    or handed to sink and dropped so that long runs stay in bounded memory.
+    The aggregates always cover every trip ever added.
+    """
+    columns = ('id', 'start_time', 'finish_time', 'min_travel_time', 'cum_wait_time')
+
+    def __init__(self, chunk_size=65536, sink=None):
+        """
+        :param chunk_size: number of rows per chunk.
+        :param sink: optional callable receiving each full chunk as a dict of column arrays.
+        """
+        self.chunk_size = chunk_size
+        self.sink = sink
+        self.chunks = []
+        self.buffer = {name: np.zeros(chunk_size, dtype=np.int64) for name in TripRecords.columns}
+        self.size = 0
+        self.count = 0
+        self.sum_cum_wait_time = 0
+        self.sum_travel_deviation = 0
+
+    @staticmethod
+    def discard(chunk):
+        """
+        Sink that drops every chunk, so that only the aggregates are kept.
+        """
+
+    def __len__(self):
+        return self.count
+
+    def append(self, id, start_time, finish_time, min_travel_time, cum_wait_time):
+        buffer = self.buffer
+        k = self.size
+        buffer['id'][k] = id
+        buffer['start_time'][k] = start_time
+        buffer['finish_time'][k] = finish_time
+        buffer['min_travel_time'][k] = min_travel_time
+        buffer['cum_wait_time'][k] = cum_wait_time
+        self.size += 1
+        self.count += 1
+        self.sum_cum_wait_time += int(cum_wait_time)
+        self.sum_travel_deviation += int(finish_time - start_time - min_travel_time)
+        if self.size == self.chunk_size:
+            self.flush()
+
+    def extend(self, id, start_time, finish_time, min_travel_time, cum_wait_time):
+        """
+        Adds a batch of trips given as equally long arrays, one per column.
+        """
+        values = dict(zip(TripRecords.columns, (id, start_time, finish_time, min_travel_time, cum_wait_time)))
+        total = len(values['id'])
+        self.count += total
+        self.sum_cum_wait_time += int(np.sum(values['cum_wait_time']))
+        self.sum_travel_deviation += int(np.sum(values['finish_time'] - values['start_time'] - values['min_travel_time']))
+        done = 0
+        while done < total:
+            k = min(total - done, self.chunk_size - self.size)
+            for name in TripRecords.columns:
+                self.buffer[name][self.size:self.size+k] = values[name][done:done+k]
+            self.size += k
+            done += k
+            if self.size == self.chunk_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Moves the rows of the current chunk to chunks (or to sink).
+        """
+        if self.size == 0:
+            return
+        chunk = {name: self.buffer[name][:self.size].copy() for name in TripRecords.columns}
+        if self.sink is not None:
+            self.sink(chunk)
+        else:
+            self.chunks.append(chunk)
+        self.size = 0
+
+    def column(self, name):
+        """
+        All rows of the named column still held in memory, oldest first.
+        'travel_time' and 'travel_deviation' are derived from the stored columns.
+        """
+        if name == 'travel_time':
+            return self.column('finish_time') - self.column('start_time')
+        if name == 'travel_deviation':
+            return self.column('travel_time') - self.column('min_travel_time')
+        return np.concatenate([chunk[name] for chunk in self.chunks] + [self.buffer[name][:self.size]])
+
+    def mean_cum_wait_time(self):
+        return self.sum_cum_wait_time / self.count if self.count else float('nan')
+
+    def mean_travel_deviation(self):
+        return self.sum_travel_deviation / self.count if self.count else float('nan')
@@ -3,33 +3,49 @@ from components.node import Node
 from components.edge import Edge
 from components.methods.methods import *
 import random
-import pygame
 
-__all__ = ['Vehicle']
+__all__ = ['Vehicle', 'make_route_dirs', 'make_route_edges', 'make_route']
 
 class Vehicle(Component):
-    def __init__(self, id, start_node, end_node, time=0):
+    """
+    Vehicle driving from an outgoing fringe node to an incoming fringe node.
+    The route is kept as a tuple of edges with the turn type (Edge.kind) of every hop,
+    and hop is the index of the current edge, or of the edge the vehicle is queued for.
+    """
+    __slots__ = ('id', 'graph', 'start_node', 'end_node', 'current', 'hop', 'timer', 'loc', 'theta', 'is_finished',
+                 'start_time', 'finish_time', 'cum_wait_time', 'route_edges', 'route_turns', 'min_travel_time')
+
+    def __init__(self, id, start_node, end_node, time=0, graph=None, route_edges=None):
+        """
+        :param route_edges: edges to follow, e.g. when restoring a snapshot. Drawn at random if None.
+        """
         super(Vehicle, self).__init__(time=time)
         self.id = id
+        self.graph = graph
         self.start_node = start_node
         self.end_node = end_node
         self.current = start_node.to_edge
-        self.current_idx = 1
+        self.hop = 0
+        self.timer = 0
         self.loc = start_node.loc
+        self.theta = None
         self.is_finished = False
         self.time = time
         self.start_time = time
         self.finish_time = None
-        self.travel_time = None
         self.cum_wait_time = 0
-        self.history = []
         assert not start_node.is_incoming, "start_node should be outgoing, but start_node.is_incoming is True."
         assert end_node.is_incoming, "end_node should be incoming, but end_node.is_incoming is False."
-        self.build_route_dirs()
-        self.build_route()
-        self.min_travel_time = self.calculate_min_travel_time()
+        if route_edges is not None:
+            self.route_edges = tuple(route_edges)
+            self.route_turns = bytes(edge.kind for edge in self.route_edges)
+            self.min_travel_time = self.calculate_min_travel_time()
+        elif graph is not None:
+            self.route_edges, self.route_turns, _, self.min_travel_time = graph.route_service.route(start_node, end_node)
+        else:
+            self.build_route()
+            self.min_travel_time = self.calculate_min_travel_time()
         self.set_image('images/vehicle_opaque_50.png')
-        self.update_rotation()
         # print(self.short_str())
 
     def __eq__(self, other):
@@ -50,114 +66,192 @@ class Vehicle(Component):
                 route_string += str(element) + '\n'
         return f'Vehicle id: {self.id}\n' + route_dirs_string + '\n' + route_string + '\n'
 
+    @property
+    def route(self):
+        """
+        Alternating list of nodes and edges, from start_node to end_node.
+        """
+        route = [self.start_node]
+        for edge in self.route_edges:
+            route += [edge, edge.end_node]
+        return route
+
+    @property
+    def route_dirs(self):
+        return [edge.start_node.dir for edge in self.route_edges if edge.kind == Edge.LINK]
+
+    @property
+    def travel_time(self):
+        return None if self.finish_time is None else self.finish_time - self.start_time
+
     def nearest_intermediate_node(self, fringe_node):
         inter = fringe_node.inter
         dir = fringe_node.dir
         is_incoming = fringe_node.is_incoming
         is_fringe = fringe_node.is_fringe
         assert is_fringe, "is_fringe should be True."
-        new_inter = inter + self.tup_dir_dict[dir]
-        new_dir = self.op_dir_dict[dir]
         new_is_incoming = not is_incoming
+        if self.graph is not None:
+            code = fringe_node.dir_code
+            di, dj = self.tup_dir_codes[code]
+            k = self.graph.tables.node(inter.i + di, inter.j + dj, self.op_dir_codes[code], new_is_incoming)
+            return self.graph.nodes[k] if k >= 0 else None
+        new_dir = self.op_dir_dict[dir]
+        new_inter = inter + self.tup_dir_dict[dir]
         new_is_fringe = False
         return Node(new_inter, new_dir, new_is_incoming, new_is_fringe)
 
-    def build_route_dirs(self):
-        start_interm_node = self.start_node.to_edge.end_node
-        end_interm_node = self.end_node.from_edge.start_node
-        start_interm_inter = start_interm_node.inter
-        end_interm_inter = end_interm_node.inter
-        delta_i = end_interm_inter.i - start_interm_inter.i
-        delta_j = end_interm_inter.j - start_interm_inter.j
-        num_ver_moves = delta_i if delta_i >= 0 else -delta_i
-        num_hor_moves = delta_j if delta_j >= 0 else -delta_j
-        ver_move = 'S' if delta_i >= 0 else 'N'
-        hor_move = 'E' if delta_j >= 0 else 'W'
-        interm_route_dirs = num_ver_moves * [ver_move] + num_hor_moves * [hor_move]
-        random.shuffle(interm_route_dirs)
-        route_dirs = []
-        route_dirs.append(self.start_node.dir)
-        route_dirs += interm_route_dirs
-        route_dirs.append(self.op_dir_dict[self.end_node.dir])
-        self.route_dirs = route_dirs
-        
-    def build_route(self):
-        route_dirs = self.route_dirs
-        route = []
-        node_0 = self.start_node
-        for i in range(len(route_dirs)):
-            dir_now = route_dirs[i]
-            if i != len(route_dirs) - 1:
-                dir_next = route_dirs[i+1]
-            assert not node_0.is_incoming, "node_0 should be outgoing, not incoming."
-            assert node_0.dir == dir_now, "node_0 should be aligned with dir_now."
-            edge_0 = node_0.to_edge
-            node_1 = edge_0.end_node
-            if i != len(route_dirs)-1:
-                for edge_option in [node_1.lt_edge, node_1.gs_edge, node_1.rt_edge]:
-                    if edge_option.end_node.dir == dir_next:
-                        edge_1 = edge_option
-                        break
-                route += [node_0, edge_0, node_1, edge_1]
-                node_0 = edge_1.end_node
+    def build_route(self, route_dirs=None):
+        """
+        :param route_dirs: directions to follow, drawn by make_route_dirs if None.
+        """
+        if self.graph is not None:
+            tables = self.graph.tables
+            if route_dirs is None:
+                route_dirs = tables.route_dirs(self.start_node.id, self.end_node.id, self.graph.rng)
             else:
-                route += [node_0, edge_0, node_1]
-        self.route = route
+                route_dirs = [self.dir_codes[dir] for dir in route_dirs]
+            edges = self.graph.edges
+            self.route_edges = tuple(edges[k] for k in tables.route_edges(self.start_node.id, route_dirs))
+            self.route_turns = bytes(edge.kind for edge in self.route_edges)
+            return
+        if route_dirs is None:
+            route_dirs = make_route_dirs(self.start_node, self.end_node)
+        self.route_edges = make_route_edges(self.start_node, route_dirs)
+        self.route_turns = bytes(edge.kind for edge in self.route_edges)
     
     def calculate_min_travel_time(self):
         min_travel_time = 0
-        for element in self.route:
-            if isinstance(element, Edge):
-                min_travel_time += element.delta_t
+        for edge in self.route_edges:
+            min_travel_time += edge.delta_t
         return min_travel_time
 
     def blit(self, screen):
+        if self.image is None:
+            self.load_image()
+        self.update_rotation()
         center_blit(self.display_image, self.loc, screen)
 
     def update_rotation(self):
-        if isinstance(self.current, Edge):
-            edge_vec = self.current.end_node.loc - self.current.start_node.loc
-            _, self.theta = edge_vec.as_polar()
-            self.display_image = pygame.transform.rotate(self.image, -self.theta-90)
+        if self.timer is not None and self.current is not None:
+            self.theta = self.current.theta
+            self.display_image = rotate_image(self.image_path, -self.theta-90)
     
     def step(self, screen=None):
         if self.is_finished:
             return
-        assert self.current is self.route[self.current_idx], \
-        f"self.current={self.current}, self.route[self.current_idx]={self.route[self.current_idx]}"
-        if isinstance(self.current, Edge):
-            # print('self.timer:',self.timer)
-            delta_t = self.current.delta_t
-            start_node = self.current.start_node
-            end_node = self.current.end_node
-            progress = self.timer / delta_t
-            self.loc = (1-progress) * start_node.loc + progress * end_node.loc
+        # timer is None while the vehicle waits in a queue.
+        if self.timer is not None:
+            edge = self.current
+            assert edge is self.route_edges[self.hop], \
+            f"self.current={edge}, self.route_edges[self.hop]={self.route_edges[self.hop]}"
+            delta_t = edge.delta_t
+            end_node = edge.end_node
+            if screen is not None:
+                # loc is only needed for drawing, so headless runs skip the interpolation.
+                progress = self.timer / delta_t
+                self.loc = interpolate(edge.start_node.loc, end_node.loc, progress)
             self.timer += 1
             if self.timer == delta_t:
+                recorder = self.graph.recorder if self.graph is not None else None
+                links = self.graph.links if self.graph is not None else None
                 if not end_node.is_fringe:
-                    next_edge = self.route[self.current_idx + 2]
-                    if next_edge is end_node.lt_edge:
-                        next_edge.start_node.lt_queue.appendleft(self)
-                        self.current = end_node
-                        self.current_idx += 1
-                        self.timer = None
-                    elif next_edge is end_node.gs_edge:
-                        next_edge.start_node.gs_queue.appendleft(self)
-                        self.current = end_node
-                        self.current_idx += 1
-                        self.timer = None
-                    elif next_edge is end_node.rt_edge or next_edge is end_node.to_edge:
-                        self.current = next_edge
-                        self.current_idx += 2
-                        self.timer = 0
+                    turn = self.route_turns[self.hop + 1]
+                    next_edge = self.route_edges[self.hop + 1]
+                    if turn == Edge.RT and links is not None and links.is_limited and not links.admit(next_edge.id):
+                        # The next link is full: wait at the end of the edge and try again next tick.
+                        self.timer = delta_t - 1
+                        self.cum_wait_time += 1
+                    else:
+                        self.hop += 1
+                        if turn == Edge.LT:
+                            end_node.lt_queue.appendleft(self)
+                            self.current = end_node
+                            self.timer = None
+                        elif turn == Edge.GS:
+                            end_node.gs_queue.appendleft(self)
+                            self.current = end_node
+                            self.timer = None
+                        else:
+                            self.current = next_edge
+                            self.timer = 0
+                            if links is not None:
+                                links.move(edge.id, next_edge.id)
+                        if recorder is not None:
+                            event = recorder.QUEUE if self.timer is None else recorder.ENTER
+                            recorder.record(self.time, event, self.id, next_edge.id)
                 else:
                     self.is_finished = True
                     self.current = None
                     self.finish_time = self.time + 1
-                    self.travel_time = self.finish_time - self.start_time
-        elif isinstance(self.current, Node):
+                    if links is not None:
+                        links.leave(edge.id)
+                    if recorder is not None:
+                        recorder.record(self.time, recorder.FINISH, self.id, edge.id)
+        else:
             self.cum_wait_time += 1
         if screen is not None:
-            self.update_rotation()
             self.blit(screen)
         self.time += 1
+
+
+def make_route_dirs(start_node, end_node, rng=random):
+    """
+    Random shortest (Manhattan) sequence of directions from start_node to end_node.
+    :param start_node: outgoing fringe node
+    :param end_node: incoming fringe node
+    :param rng: random.Random instance (or the random module) used for the shuffle
+    :return: list of directions, one per link edge of the route
+    """
+    op_dir_dict = Component.op_dir_dict
+    start_interm_node = start_node.to_edge.end_node
+    end_interm_node = end_node.from_edge.start_node
+    start_interm_inter = start_interm_node.inter
+    end_interm_inter = end_interm_node.inter
+    delta_i = end_interm_inter.i - start_interm_inter.i
+    delta_j = end_interm_inter.j - start_interm_inter.j
+    num_ver_moves = delta_i if delta_i >= 0 else -delta_i
+    num_hor_moves = delta_j if delta_j >= 0 else -delta_j
+    ver_move = 'S' if delta_i >= 0 else 'N'
+    hor_move = 'E' if delta_j >= 0 else 'W'
+    interm_route_dirs = num_ver_moves * [ver_move] + num_hor_moves * [hor_move]
+    rng.shuffle(interm_route_dirs)
+    route_dirs = []
+    route_dirs.append(start_node.dir)
+    route_dirs += interm_route_dirs
+    route_dirs.append(op_dir_dict[end_node.dir])
+    return route_dirs
+
+
+def make_route_edges(start_node, route_dirs):
+    """
+    Tuple of edges followed when driving route_dirs from start_node.
+    """
+    route_edges = []
+    node_0 = start_node
+    for i in range(len(route_dirs)):
+        dir_now = route_dirs[i]
+        assert not node_0.is_incoming, "node_0 should be outgoing, not incoming."
+        assert node_0.dir == dir_now, "node_0 should be aligned with dir_now."
+        edge_0 = node_0.to_edge
+        route_edges.append(edge_0)
+        if i != len(route_dirs)-1:
+            dir_next = route_dirs[i+1]
+            node_1 = edge_0.end_node
+            for edge_option in [node_1.lt_edge, node_1.gs_edge, node_1.rt_edge]:
+                if edge_option.end_node.dir == dir_next:
+                    edge_1 = edge_option
+                    break
+            route_edges.append(edge_1)
+            node_0 = edge_1.end_node
+    return tuple(route_edges)
+
+
+def make_route(start_node, route_dirs):
+    """
+    Alternating list of nodes and edges followed when driving route_dirs from start_node.
+    """
+    route = [start_node]
+    for edge in make_route_edges(start_node, route_dirs):
+        route += [edge, edge.end_node]
+    return route
\ No newline at end of file
@@ -1,13 +1,32 @@
+import argparse
 import pygame
 from components.graph import Graph
+from components.renderer import Renderer, SimulationThread
 
-pygame.init()
+parser = argparse.ArgumentParser(description='Congestion Control Simulation viewer.')
+parser.add_argument('--size', default='3x3', help='grid size as HxL')
+parser.add_argument('--engine', default='object', choices=list(Graph.engines))
+parser.add_argument('--seed', type=int, default=None)
+parser.add_argument('--speed', type=float, default=1.0,
+                    help='simulation speed-up over 30 ticks per second, 0 to run as fast as possible')
+parser.add_argument('--fps', type=int, default=30, help='display frame rate')
+parser.add_argument('--sync', action='store_true', help='step and draw together, one tick per frame')
+args = parser.parse_args()
+H, L = (int(x) for x in args.size.lower().split('x'))
+
+# Only the subsystems the viewer uses: pygame.init() would also start audio, joystick etc.
+pygame.display.init()
+pygame.font.init()
 logo = pygame.image.load('images/logo_32x32.png')
 pygame.display.set_icon(logo)
 pygame.display.set_caption('Congestion Control Simulation')
 screen = pygame.display.set_mode((960, 960))
 clock = pygame.time.Clock()
-graph = Graph(3, 3)
+graph = Graph(H, L, engine=args.engine, seed=args.seed)
+if not args.sync:
+    renderer = Renderer(graph)
+    simulation = SimulationThread(graph, ticks_per_second=30 * args.speed if args.speed > 0 else None)
+    simulation.start()
 running = True
 while running:
     for event in pygame.event.get():
@@ -16,6 +35,12 @@ while running:
             # change the value to False, to exit the main loop
             running = False
     screen.fill((0, 0, 0))
-    graph.step(screen=screen)
+    if args.sync:
+        graph.step(screen=screen)
+    else:
+        renderer.update(simulation.latest())
+        renderer.draw(screen)
     pygame.display.flip()
-    clock.tick(30)
+    clock.tick(args.fps)
+if not args.sync:
+    simulation.stop()
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from components.graph import Graph
+from components.signals import ExternalPolicy
+
+
+def new_graph(engine):
+    graph = Graph(4, 4, engine=engine, seed=6)
+    graph.verbose = False
+    return graph
+
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_windows_match_ticks(engine):
+    actions = np.random.default_rng(0).integers(8, size=(20, 16))
+    windowed, stepped = new_graph(engine), new_graph(engine)
+    stepped.signals.policy = ExternalPolicy(stepped)
+    for window in actions:
+        observation, rewards, done = windowed.advance(window, 37)
+        stepped.signals.policy.set_actions(window)
+        for _ in range(37):
+            stepped.step()
+        assert observation['time'] == stepped.time
+        np.testing.assert_array_equal(observation['queue_lengths'], stepped.queue_lengths())
+        # The metrics are nan until the first trip finishes.
+        np.testing.assert_equal(windowed.metrics(), stepped.metrics())
+        np.testing.assert_array_equal(windowed.stats.queue_delay, stepped.stats.queue_delay)
+    assert not done and len(windowed.trips) > 0
+
+
+def test_stops_at_t_sim():
+    graph = new_graph('array')
+    graph.t_sim = 100
+    _, _, done = graph.advance(None, 60)
+    assert not done
+    observation, _, done = graph.advance(None, 60)
+    assert done and observation['time'] == 100
+
+
+def test_event_engine():
+    with pytest.raises(ValueError):
+        new_graph('event').advance(None, 30)
@@ -0,0 +1,50 @@
+import random
+import numpy as np
+import pytest
+from components.graph import Graph
+from components.trip_records import TripRecords
+
+# Metrics of the original object simulation of a 3 x 3 grid after random.seed(seed), at the default t_sim.
+baseline = {1: (98.40398009950249, 98.40398009950249, 795), 7: (100.08508508508508, 100.08508508508508, 801)}
+
+
+def run(H, L, engine, seed=None, t_sim=None, capacity=None, **kwargs):
+    graph = Graph(H, L, engine=engine, seed=seed, **kwargs)
+    graph.verbose = False
+    graph.set_capacity(capacity)
+    if t_sim is not None:
+        graph.t_sim = t_sim
+    graph.run()
+    return graph
+
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+@pytest.mark.parametrize('seed', sorted(baseline))
+def test_baseline(engine, seed):
+    random.seed(seed)
+    graph = Graph(3, 3, engine=engine)
+    graph.verbose = False
+    while graph.time <= graph.t_sim:
+        graph.step()
+    assert (graph.avg_cum_wait_time, graph.avg_travel_deviation, graph.num_circulating_vehicles) == baseline[seed]
+
+
+# Horizons long enough for the array engine to reuse the slots of finished vehicles.
+@pytest.mark.parametrize('H, L, v_star, t_sim', [(5, 5, 2, 1200), (6, 4, 2, 1200), (4, 4, 1, 1500), (4, 4, 2, 1500),
+                                                 (4, 4, 3, 1500)])
+def test_array_matches_object(H, L, v_star, t_sim):
+    graphs = [run(H, L, engine, seed=11, t_sim=t_sim, v_star=v_star) for engine in ('object', 'array')]
+    assert graphs[0].metrics() == graphs[1].metrics()
+    for name in TripRecords.columns:
+        np.testing.assert_array_equal(graphs[0].trips.column(name), graphs[1].trips.column(name))
+    np.testing.assert_array_equal(graphs[0].queue_lengths(), graphs[1].queue_lengths())
+
+
+@pytest.mark.parametrize('capacity', [3, 8])
+@pytest.mark.parametrize('seed', [2, 11])
+def test_array_matches_object_with_capacities(capacity, seed):
+    graphs = [run(4, 4, engine, seed=seed, t_sim=1200, capacity=capacity, v_star=3) for engine in ('object', 'array')]
+    assert graphs[0].links.is_limited
+    assert graphs[0].metrics() == graphs[1].metrics()
+    np.testing.assert_array_equal(graphs[0].links.flow, graphs[1].links.flow)
+    np.testing.assert_array_equal(graphs[0].links.occupancy, graphs[1].links.occupancy)
@@ -0,0 +1,45 @@
+import random
+import numpy as np
+import pytest
+from components.graph import Graph
+from components.signals import MaxPressurePolicy
+from components.trip_records import TripRecords
+from tests.test_array_engine import baseline, run
+
+
+@pytest.mark.parametrize('seed', sorted(baseline))
+def test_baseline(seed):
+    random.seed(seed)
+    graph = Graph(3, 3, engine='event')
+    graph.verbose = False
+    graph.run()
+    assert (graph.avg_cum_wait_time, graph.avg_travel_deviation, graph.num_circulating_vehicles) == baseline[seed]
+
+
+@pytest.mark.parametrize('H, L, v_star', [(5, 5, 2), (6, 4, 2), (4, 4, 1), (4, 4, 3)])
+def test_event_matches_array(H, L, v_star):
+    graphs = [run(H, L, engine, seed=11, t_sim=900, v_star=v_star) for engine in ('array', 'event')]
+    assert graphs[0].metrics() == graphs[1].metrics()
+    for name in TripRecords.columns:
+        np.testing.assert_array_equal(graphs[0].trips.column(name), graphs[1].trips.column(name))
+
+
+def test_sparse_demand():
+    metrics = []
+    for engine in ('object', 'event'):
+        graph = Graph(4, 4, engine=engine, seed=5)
+        graph.verbose = False
+        graph.t_sim = 1200
+        graph.spawn_period = 7
+        graph.run()
+        metrics.append(graph.metrics())
+    assert metrics[0] == metrics[1]
+
+
+def test_unsupported_settings():
+    graph = Graph(3, 3, engine='event', seed=1)
+    with pytest.raises(ValueError):
+        graph.set_capacity(10)
+    graph.signals.policy = MaxPressurePolicy()
+    with pytest.raises(ValueError):
+        graph.step()
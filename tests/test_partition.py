@@ -0,0 +1,16 @@
+import pytest
+from components.graph import Graph
+from components.partition import PartitionedSimulation
+
+
+@pytest.mark.parametrize('tiles', [(2, 2), (1, 3)])
+def test_partitioned_matches_single_process(tiles):
+    simulation = PartitionedSimulation(4, 3, tiles=tiles, seed=3, t_sim=1200)
+    metrics = simulation.run()
+    graph = Graph(4, 3, engine='array', seed=3)
+    graph.verbose = False
+    graph.t_sim = 1200
+    graph.run()
+    assert metrics == graph.metrics()
+    assert simulation.stats.od_count.sum() == graph.stats.od_count.sum()
+    assert simulation.stats.queue_delay.sum() == graph.stats.queue_delay.sum()
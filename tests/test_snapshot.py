@@ -0,0 +1,118 @@
+import random
+import numpy as np
+import pytest
+from components.demand import PeriodicDemand, PoissonDemand, piecewise_rate
+from components.graph import Graph
+from components.scenario import build_graph
+from components.signals import MaxPressurePolicy
+from components.trip_records import TripRecords
+
+
+def assert_same_run(graph, restored):
+    graph.run()
+    restored.run()
+    assert graph.metrics() == restored.metrics()
+    for name in TripRecords.columns:
+        np.testing.assert_array_equal(graph.trips.column(name), restored.trips.column(name))
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'event'])
+def test_save_load(engine, tmp_path):
+    graph = Graph(3, 3, engine=engine, seed=5)
+    graph.verbose = False
+    graph.run(until=900)
+    graph.save(tmp_path / 'graph.snap')
+    assert_same_run(graph, Graph.load(tmp_path / 'graph.snap'))
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'event'])
+def test_global_random_state(engine, tmp_path):
+    random.seed(0)
+    graph = Graph(3, 3, engine=engine)
+    graph.verbose = False
+    graph.run(until=900)
+    graph.save(tmp_path / 'graph.snap')
+    graph.run()
+    # Loading resets the global random module to its saved state, so the restored graph runs after the original.
+    restored = Graph.load(tmp_path / 'graph.snap')
+    restored.run()
+    assert graph.metrics() == restored.metrics()
+
+
+@pytest.mark.parametrize('engine', ['object', 'array'])
+def test_fork_keeps_policy_and_capacity(engine):
+    graph = Graph(4, 4, engine=engine, seed=2)
+    graph.verbose = False
+    graph.signals.policy = MaxPressurePolicy(period=10, modes=[0, 1, 2, 3])
+    graph.set_capacity(12)
+    graph.run(until=700)
+    fork = graph.fork()
+    assert isinstance(fork.signals.policy, MaxPressurePolicy)
+    assert_same_run(graph, fork)
+
+
+def test_fork_keeps_external_actions():
+    graph = Graph(3, 3, engine='array', seed=4)
+    graph.verbose = False
+    graph.advance(np.arange(9) % 4, 300)
+    fork = graph.fork()
+    np.testing.assert_array_equal(fork.signals.policy.actions, graph.signals.policy.actions)
+    assert_same_run(graph, fork)
+
+
+def test_fork_keeps_scenario_timing():
+    graph = build_graph({'seed': 3, 'engine': 'object', 't_sim': 1000, 'grid': {'delta_tL': 60, 'delta_tI': 5},
+                         'signals': {'policy': 'green_wave'}})
+    graph.run(until=400)
+    fork = graph.fork()
+    assert (fork.delta_tL, fork.delta_tI) == (60, 5)
+    assert_same_run(graph, fork)
+
+
+@pytest.mark.parametrize('engine', ['object', 'array', 'event'])
+def test_fork_keeps_demand(engine, tmp_path):
+    graph = Graph(3, 3, engine=engine, seed=1)
+    graph.verbose = False
+    graph.t_sim = 1200
+    graph.set_demand(PoissonDemand(graph, rate=piecewise_rate([0, 300], [3.0, 1.0], period=500), seed=2,
+                                   chunk_ticks=250))
+    graph.run(until=600)
+    fork = graph.fork()
+    graph.save(tmp_path / 'graph.snap')
+    restored = Graph.load(tmp_path / 'graph.snap')
+    assert isinstance(fork.demand, PoissonDemand)
+    assert_same_run(graph, fork)
+    restored.run()
+    assert restored.metrics() == graph.metrics()
+
+
+def test_fork_keeps_periodic_demand():
+    graph = Graph(3, 3, engine='array', seed=1)
+    graph.verbose = False
+    graph.set_demand(PeriodicDemand(graph, period=2, origin_weights=np.arange(1, 13), seed=3, chunk_ticks=100))
+    graph.run(until=500)
+    assert_same_run(graph, graph.fork())
+
+
+def test_rate_function_is_not_saved():
+    graph = Graph(3, 3, engine='array', seed=1)
+    graph.set_demand(PoissonDemand(graph, rate=lambda ticks: np.full(len(ticks), 2.0), seed=1))
+    with pytest.raises(ValueError):
+        graph.snapshot()
+
+
+def test_unknown_policy():
+    graph = Graph(3, 3, engine='array', seed=1)
+    graph.signals.policy = lambda controller, time: np.zeros(9, dtype=np.intp)
+    with pytest.raises(ValueError):
+        graph.snapshot()
+
+
+def test_fork_with_seed_branches():
+    graph = Graph(3, 3, engine='array', seed=1)
+    graph.verbose = False
+    graph.run(until=600)
+    branches = [graph.fork(seed=seed) for seed in (1, 2, 1)]
+    for branch in branches:
+        branch.run()
+    assert branches[0].metrics() == branches[2].metrics() != branches[1].metrics()
@@ -1,17 +1,72 @@
 """
+Multi-agent RLlib environment controlling the signals of a Graph, one agent per intermediate intersection.
+"""
 from ray.rllib.env.multi_agent_env import MultiAgentEnv
-import pygame
 import gym
 import numpy as np
+from components.graph import Graph
+from components.intersection import Intersection
 
 
 class Traffic(MultiAgentEnv):
+    """
+    Every agent picks the mode (row of Intersection.traffic_light) of its intersection once per decision,
+    and one Graph.advance call runs the decision_ticks ticks in between, stepping the engine's phases directly.
+    Observation of an agent: its lt/gs queue lengths (ordered as Intersection.idx_1 and idx_2), the mean
+    queue lengths over the last decision, and its current mode one-hot encoded.
+    Reward of an agent: minus the vehicle-ticks waited at its intersection during the last decision.
+    Config keys:
+        width, height  : number of intermediate intersections per row and column (10)
+        ts             : decisions per episode (100)
+        decision_ticks : ticks per decision (30, one phase of the default plan)
+        engine         : 'object' or 'array' ('array')
+        seed           : seed of the first episode, incremented every episode (None for unseeded episodes)
+    """
     def __init__(self, config=None):
         config = config or {}
         self.width = config.get("width", 10)
         self.height = config.get("height", 10)
 
         self.timestep_limit = config.get("ts", 100)
-        
-        self.observation_space = 
-"""
\ No newline at end of file
+        self.decision_ticks = config.get("decision_ticks", 30)
+        self.engine = config.get("engine", "array")
+        self.seed = config.get("seed", None)
+        self.num_episodes = 0
+        self.num_modes = len(Intersection.traffic_light)
+        self.graph = None
+        self.agents = [f"{i}_{j}" for i in range(1, self.height + 1) for j in range(1, self.width + 1)]
+
+        self.observation_space = gym.spaces.Box(low=0, high=np.inf, shape=(16 + self.num_modes,), dtype=np.float32)
+        self.action_space = gym.spaces.Discrete(self.num_modes)
+
+    def reset(self):
+        seed = None if self.seed is None else self.seed + self.num_episodes
+        self.num_episodes += 1
+        self.graph = Graph(self.height, self.width, engine=self.engine, seed=seed)
+        self.graph.t_sim = self.timestep_limit * self.decision_ticks
+        self.graph.verbose = False
+        observation, _, _ = self.graph.advance(None, 0)
+        return self.observe(observation, 1)
+
+    def observe(self, observation, ticks):
+        # Modes are -1 before the first tick, which encodes as all zeros.
+        modes = observation["modes"][:, None] == np.arange(self.num_modes)
+        features = np.concatenate([observation["queue_lengths"].reshape(-1, 8),
+                                   observation["wait_ticks"].reshape(-1, 8) / max(ticks, 1), modes], axis=1)
+        return {agent: features[k].astype(np.float32) for k, agent in enumerate(self.agents)}
+
+    def step(self, action_dict):
+        """
+        :param action_dict: agent id -> mode; agents without an action keep their mode.
+        """
+        actions = self.graph.signals.policy.actions.copy()
+        for k, agent in enumerate(self.agents):
+            if agent in action_dict:
+                actions[k] = action_dict[agent]
+        start = self.graph.time
+        observation, rewards, done = self.graph.advance(actions, self.decision_ticks)
+        obs = self.observe(observation, self.graph.time - start)
+        rewards = {agent: float(rewards[k]) for k, agent in enumerate(self.agents)}
+        dones = {agent: done for agent in self.agents}
+        dones["__all__"] = done
+        return obs, rewards, dones, {}